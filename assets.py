@@ -0,0 +1,60 @@
+import threading
+import time
+import pygame
+from settings import images_dir, IMAGE_FILES
+from sounds import sound_bank
+
+
+class AssetRegistry:
+    """
+    Images loaded the first time something asks for them and kept from then
+    on, so importing the game reads nothing from disk and a run only pays for
+    the assets it actually uses.
+
+    Images are named by the keys of settings.IMAGE_FILES, or by their path
+    inside the images folder, like "blood/4.png". Asking for a size returns
+    a scaled copy, and alpha=True one converted for fast alpha blits, each
+    made once and shared by everything that asks for it. warm() loads
+    everything up front.
+    """
+
+    def __init__(self, directory=images_dir, files=IMAGE_FILES):
+        self.directory = directory
+        self.files = files
+        self.images = {}  # (name, size, alpha) -> Surface
+        self.lock = threading.RLock()  # The level preloader loads images from its own thread
+        self.load_count = 0
+        self.load_time = 0.0  # Milliseconds spent reading and scaling images
+
+    def image(self, name, size=None, alpha=False):
+        key = (name, size, alpha)
+        image = self.images.get(key)
+        if image is None:
+            with self.lock:
+                image = self.images.get(key)
+                if image is None:
+                    if size:
+                        # Converted before scaling, the way pickups always did it
+                        original = self.image(name, alpha=alpha)
+                        start = time.perf_counter()
+                        image = pygame.transform.scale(original, size)
+                    elif alpha:
+                        original = self.image(name)
+                        start = time.perf_counter()
+                        image = original.convert_alpha()
+                    else:
+                        start = time.perf_counter()
+                        image = pygame.image.load(f"{self.directory}/{self.files.get(name, name)}")
+                    self.images[key] = image
+                    self.load_count += 1
+                    self.load_time += (time.perf_counter() - start) * 1000
+        return image
+
+    def warm(self):
+        # Load every named image and decode every sound now instead of on first use
+        for name in self.files:
+            self.image(name)
+        sound_bank.warm()
+
+
+assets = AssetRegistry()
@@ -0,0 +1,291 @@
+"""
+Benchmark the game on every level and on synthetic stress maps.
+
+    python benchmark.py --frames 600 --output before.json
+    python benchmark.py --compare before.json
+
+Each scenario loads a map, plays it with scripted input and times map load,
+player construction, and every frame's player, bullet, zombie and render
+stages. The results are written as JSON with p50/p95/p99 timings in
+milliseconds. --compare checks them against an earlier results file and
+flags stages that got slower.
+"""
+import os
+
+# Has to be set before settings is imported
+os.environ.setdefault("ZOMBIE_SHOOTER_HEADLESS", "1")
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import pygame
+import gametime
+from main import (Camera, build_map, create_map, check_pickups, draw_world, draw_darkness, update_zombies, open_window)
+from player import Player, reset_gun_info
+from horde import Horde, HORDE_AVAILABLE
+from pathfinding import FlowField
+from broadphase import Broadphase
+from crowd import Crowd
+from vision import Vision
+from profiler import FrameProfiler
+from rendering import WallLayer
+from lighting import Lighting
+from headless import ScriptedInput, FRAME_TIME
+from memory import MemoryReport
+from world import zombies_left
+from assets import assets
+from settings import (actual_screen_width, actual_screen_height, MAX_LEVEL, torch_radius,
+                      USE_HORDE_ENGINE, USE_FLOW_FIELD, ZOMBIE_SEPARATION, ZOMBIE_VISION)
+
+
+# Synthetic maps as (name, columns, rows, zombies)
+STRESS_MAPS = [
+    ("stress_60x60_500", 60, 60, 500),
+    ("stress_120x120_2000", 120, 120, 2000),
+]
+
+REGRESSION_THRESHOLD = 1.10  # A stage counts as slower when its p95 grows by more than 10%
+REGRESSION_MIN_MS = 0.1  # and by more than this, so timer noise on tiny stages is ignored
+
+
+def stress_layout(cols, rows, zombie_count, seed=0):
+    """
+    A bordered map with scattered walls, breakable walls and pickups, the
+    player in the middle and zombies on random free cells.
+    """
+    rng = random.Random(seed)
+    layout = [[0] * cols for _ in range(rows)]
+    for y in range(rows):
+        for x in range(cols):
+            if x in (0, cols - 1) or y in (0, rows - 1):
+                layout[y][x] = 1
+            else:
+                roll = rng.random()
+                if roll < 0.12:
+                    layout[y][x] = 1
+                elif roll < 0.14:
+                    layout[y][x] = 6
+                elif roll < 0.15:
+                    layout[y][x] = rng.choice([2, 3, 9, 10, 11, 12])
+
+    # Clear the area around the player start
+    start_x, start_y = cols // 2, rows // 2
+    for y in range(start_y - 2, start_y + 3):
+        for x in range(start_x - 2, start_x + 3):
+            layout[y][x] = 0
+    layout[start_y][start_x] = 5
+
+    free = [(x, y) for y in range(rows) for x in range(cols)
+            if layout[y][x] == 0 and (abs(x - start_x) > 4 or abs(y - start_y) > 4)]
+    for x, y in rng.sample(free, min(zombie_count, len(free))):
+        layout[y][x] = 4
+    return layout
+
+
+def percentile(values, pct):
+    # Nearest rank percentile of a list of numbers
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_scenario(name, load, frames, seed, repeats, separation=ZOMBIE_SEPARATION, vision=ZOMBIE_VISION):
+    # load is a function returning a built map, like create_map for a level number
+    if repeats < 1:
+        raise ValueError("A scenario needs at least one map load to play on")
+    screen = open_window()
+    random.seed(seed)
+    reset_gun_info()  # Every scenario starts with full magazines
+    gametime.use_virtual_clock()
+
+    # Map load and player construction, repeated to get a spread of timings
+    load_times = []
+    player_times = []
+    for _ in range(repeats):
+        level, elapsed = timed(load)
+        load_times.append(elapsed)
+        player, elapsed = timed(Player, actual_screen_width, actual_screen_height)
+        player_times.append(elapsed)
+
+    memory = MemoryReport().add_level(level).summary()
+    walls, player_start, zombies, pickups, guns, dead_body, blood = level
+    player.x, player.y = player_start
+    zombie_count = zombies_left(walls, zombies)
+
+    camera = Camera(actual_screen_width, actual_screen_height, player)
+    lighting = Lighting(actual_screen_width, actual_screen_height, torch_radius)
+    wall_layer = WallLayer()
+    horde = Horde() if USE_HORDE_ENGINE and HORDE_AVAILABLE else None
+    flow_field = FlowField() if USE_FLOW_FIELD else None
+    broadphase = Broadphase()
+    crowd = Crowd() if separation else None
+    vision = Vision() if vision else None
+    profiler = FrameProfiler(enabled=True)  # Only used to split streaming, vision and separation out of the zombie stage
+    dead_zombie_list = []
+    last_hit_time = gametime.get_ticks()
+    script = ScriptedInput(seed)
+
+    background = assets.image("background", (actual_screen_width, actual_screen_height))
+    stages = {"player": [], "bullets": [], "streaming": [], "vision": [], "separation": [], "zombies": [], "render": [],
+              "frame": []}
+    max_per_cell = 0
+    for _ in range(frames):
+        frame_start = time.perf_counter()
+        direction, shoot, reload = script.next(player)
+
+        start = time.perf_counter()
+        if shoot:
+            player.shoot()
+        if reload:
+            player.reload()
+        check_pickups(player, pickups, guns, broadphase)
+        player.move(direction, walls)
+        player.update_animation()
+        stages["player"].append((time.perf_counter() - start) * 1000)
+
+        _, elapsed = timed(player.update_bullets, walls, zombies, dead_zombie_list, broadphase)
+        stages["bullets"].append(elapsed)
+
+        profiler.begin_frame()
+        last_hit_time, elapsed = timed(update_zombies, player, walls, zombies, last_hit_time, horde, flow_field, broadphase,
+                                       crowd, profiler, vision)
+        stages["zombies"].append(elapsed)
+        stages["streaming"].append(profiler.current.get("streaming", 0.0))
+        stages["vision"].append(profiler.current.get("vision", 0.0))
+        stages["separation"].append(profiler.current.get("separation", 0.0))
+        max_per_cell = max(max_per_cell, max(map(len, broadphase.zombies.cells.values()), default=0))
+
+        start = time.perf_counter()
+        camera.update(player)
+        screen.blit(background, (0, 0))
+        draw_world(screen, camera, wall_layer, player, walls, zombies, pickups, guns, dead_body, blood, dead_zombie_list)
+        draw_darkness(screen, camera, lighting, player)
+        stages["render"].append((time.perf_counter() - start) * 1000)
+
+        gametime.advance(FRAME_TIME)
+        stages["frame"].append((time.perf_counter() - frame_start) * 1000)
+
+    result = {
+        "name": name,
+        "cells": [walls.cols, walls.rows],
+        "walls": len(walls),
+        "zombies": zombie_count,
+        "zombies_left": zombies_left(walls, zombies),
+        "streamed": walls.world is not None,
+        "sectors_loaded": len(walls.world.loaded) if walls.world else 0,
+        "separation_enabled": bool(crowd),
+        "vision_enabled": bool(vision),
+        "zombies_chasing": sum(1 for zombie in zombies if zombie.alerted or not vision),
+        "vision_rays": vision.rays if vision else 0,
+        "max_zombies_per_cell": max_per_cell,
+        "frames": frames,
+        "map_load": summarize(load_times),
+        "player_init": summarize(player_times),
+        "memory": memory,
+    }
+    for stage, values in stages.items():
+        result[stage] = summarize(values)
+    return result
+
+
+def compare(results, baseline_path):
+    # Print stages whose p95 got slower than the baseline, returns how many regressed
+    with open(baseline_path) as file:
+        baseline = {scenario["name"]: scenario for scenario in json.load(file)["scenarios"]}
+
+    regressions = 0
+    for scenario in results["scenarios"]:
+        old = baseline.get(scenario["name"])
+        if not old:
+            continue
+        for stage in ("map_load", "player_init", "player", "bullets", "streaming", "vision", "separation", "zombies", "render",
+                      "frame"):
+            if stage not in old or stage not in scenario:
+                continue
+            before, after = old[stage]["p95"], scenario[stage]["p95"]
+            if after > before * REGRESSION_THRESHOLD and after - before > REGRESSION_MIN_MS:
+                regressions += 1
+                print(f"REGRESSION {scenario['name']} {stage}: p95 {before:.3f}ms -> {after:.3f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the zombie shooter per level and per subsystem")
+    parser.add_argument("--frames", type=int, default=600, help="frames to play in each scenario")
+    parser.add_argument("--repeats", type=int, default=5, help="times to repeat map load and player construction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="run just the scenarios whose name contains this text")
+    parser.add_argument("--no-stress", action="store_true", help="skip the synthetic stress maps")
+    parser.add_argument("--map", action="append", default=[], help="also play this level file, can be repeated")
+    parser.add_argument("--no-separation", action="store_true", help="turn zombie separation off to compare against")
+    parser.add_argument("--no-vision", action="store_true", help="have every zombie chase from the start")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    # Levels load through the compiled level cache like the game does, stress maps are built from their rows
+    scenarios = [(f"level{level}", lambda level=level: create_map(level)) for level in range(1, MAX_LEVEL + 1)]
+    if not args.no_stress:
+        scenarios += [(name, lambda layout=stress_layout(cols, rows, zombies, args.seed): build_map(layout))
+                      for name, cols, rows, zombies in STRESS_MAPS]
+    scenarios += [(os.path.splitext(os.path.basename(path))[0], lambda path=path: create_map(path)) for path in args.map]
+    if args.only:
+        scenarios = [(name, load) for name, load in scenarios if args.only in name]
+
+    results = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "resolution": [actual_screen_width, actual_screen_height],
+        "horde_engine": bool(USE_HORDE_ENGINE and HORDE_AVAILABLE),
+        "flow_field": USE_FLOW_FIELD,
+        "separation": not args.no_separation and ZOMBIE_SEPARATION,
+        "vision": not args.no_vision and ZOMBIE_VISION,
+        "seed": args.seed,
+        "scenarios": [],
+    }
+    for name, load in scenarios:
+        scenario = run_scenario(name, load, args.frames, args.seed, args.repeats,
+                                not args.no_separation and ZOMBIE_SEPARATION, not args.no_vision and ZOMBIE_VISION)
+        results["scenarios"].append(scenario)
+        print(f"{name:>22}: load {scenario['map_load']['p50']:7.2f}ms  "
+              f"vision p95 {scenario['vision']['p95']:.2f}ms  "
+              f"separation p95 {scenario['separation']['p95']:.2f}ms  "
+              f"zombies p50/p95/p99 {scenario['zombies']['p50']:.2f}/{scenario['zombies']['p95']:.2f}/{scenario['zombies']['p99']:.2f}ms  "
+              f"render p95 {scenario['render']['p95']:.2f}ms  frame p95 {scenario['frame']['p95']:.2f}ms")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
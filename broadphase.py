@@ -0,0 +1,69 @@
+from settings import CELL_SIZE_SCALED, ZOMBIE_SIZE
+from spatial import EntityGrid
+
+
+PICKUP_SIZE = 10  # Pickups are touched when the player overlaps this much of their top left corner
+
+
+class Broadphase:
+    """
+    Per tick spatial indexes for everything the player and bullets overlap
+    with: a grid of moving zombies kept up to date as they move, and a static
+    grid of ammo, health and gun pickups. Bullet hits, zombie contact damage
+    and pickups all query these instead of scanning every entity.
+
+    A new level hands over new lists, which are picked up and indexed again
+    automatically.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE_SCALED):
+        self.zombies = EntityGrid(cell_size)
+        self.items = EntityGrid(cell_size)
+        self.zombie_list = None
+        self.pickups = None
+        self.guns = None
+
+    def zombie_grid(self, zombies):
+        # The zombie grid, indexed again if the list is new or changed behind our back
+        if zombies is not self.zombie_list or len(zombies) != len(self.zombies):
+            self.zombie_list = zombies
+            self.zombies.rebuild(zombies, ZOMBIE_SIZE, ZOMBIE_SIZE)
+        return self.zombies
+
+    def forget(self):
+        # Index everything again on next use, for lists that changed without changing length
+        self.zombie_list = None
+        self.pickups = None
+        self.guns = None
+
+    def sync_zombies(self, zombies):
+        # Call after zombies move, only zombies that changed cells are moved in the grid
+        grid = self.zombie_grid(zombies)
+        grid.move_all(zombies)
+        return grid
+
+    def remove_zombie(self, zombie):
+        self.zombies.remove(zombie)
+
+    def item_grid(self, pickups, guns):
+        # Pickups don't move, so they are only indexed when a level is loaded
+        count = len(pickups["ammo"]) + len(pickups["health"]) + len(guns)
+        if pickups is not self.pickups or guns is not self.guns or count != len(self.items):
+            self.pickups = pickups
+            self.guns = guns
+            self.items.clear()
+            # Inserted in the order the old checks ran: ammo, health, then guns
+            for item in pickups["ammo"]:
+                self.items.insert(("ammo", item), item[0].x, item[0].y, PICKUP_SIZE, PICKUP_SIZE)
+            for item in pickups["health"]:
+                self.items.insert(("health", item), item.x, item.y, PICKUP_SIZE, PICKUP_SIZE)
+            for item in guns:
+                self.items.insert(("gun", item), item[0].x, item[0].y, PICKUP_SIZE, PICKUP_SIZE)
+        return self.items
+
+    def touching_items(self, pickups, guns, x, y, width, height):
+        # (kind, item) for every pickup overlapping the box
+        return self.item_grid(pickups, guns).query(x, y, width, height)
+
+    def remove_item(self, entry):
+        self.items.remove(entry)
@@ -0,0 +1,82 @@
+import math
+from settings import SEPARATION_RADIUS, SEPARATION_WEIGHT
+
+NO_PUSH = (0.0, 0.0)
+
+
+class Crowd:
+    """
+    Keeps zombies from piling up on one another. Every tick each zombie gets
+    a push away from the zombies closer than radius, stronger the closer they
+    are, which move_towards_player blends into its chase direction.
+
+    Neighbours come from the broadphase zombie grid: each cell is only
+    compared with itself and the cells ahead of it, so every nearby pair is
+    looked at once and the cost grows with the zombie count, not its square.
+    All pushes are worked out from where the zombies stood at the start of
+    the tick, so the result doesn't depend on the order they move in.
+    """
+
+    def __init__(self, radius=SEPARATION_RADIUS, weight=SEPARATION_WEIGHT):
+        self.radius = radius
+        self.weight = weight
+
+    def pushes(self, zombies, grid):
+        """
+        (push_x, push_y) for each zombie in the list, already scaled by the
+        weight. Zombies with nobody close get NO_PUSH.
+        """
+        radius = self.radius
+        radius_squared = radius * radius
+        reach = int(math.ceil(radius / grid.cell_size))
+        # Half the neighbourhood, the other half is covered when those cells take their turn
+        ahead = [(ox, oy) for oy in range(0, reach + 1) for ox in range(-reach, reach + 1) if oy > 0 or ox > 0]
+
+        cells = grid.cells
+        push = {}
+        for (cell_x, cell_y), bucket in cells.items():
+            # Zombies in the cells ahead, gathered once for the whole bucket
+            neighbours = []
+            for ox, oy in ahead:
+                group = cells.get((cell_x + ox, cell_y + oy))
+                if group:
+                    neighbours.extend(group)
+            count = len(bucket)
+            if count == 1 and not neighbours:
+                continue
+
+            for i in range(count):
+                a = bucket[i]
+                ax, ay = a.x, a.y
+                for b in (bucket[i + 1:] + neighbours if i + 1 < count else neighbours):
+                    dx = ax - b.x
+                    dy = ay - b.y
+                    distance_squared = dx * dx + dy * dy
+                    if distance_squared >= radius_squared:
+                        continue
+                    if distance_squared == 0:
+                        dx, dy = 1.0, 0.0  # Exactly on top of each other, split them sideways
+                    else:
+                        distance = math.sqrt(distance_squared)
+                        strength = (radius - distance) / (radius * distance)
+                        dx *= strength
+                        dy *= strength
+                    vector = push.get(id(a))
+                    if vector:
+                        vector[0] += dx
+                        vector[1] += dy
+                    else:
+                        push[id(a)] = [dx, dy]
+                    vector = push.get(id(b))
+                    if vector:
+                        vector[0] -= dx
+                        vector[1] -= dy
+                    else:
+                        push[id(b)] = [-dx, -dy]
+
+        weight = self.weight
+        result = []
+        for zombie in zombies:
+            vector = push.get(id(zombie))
+            result.append((vector[0] * weight, vector[1] * weight) if vector else NO_PUSH)
+        return result
@@ -0,0 +1,32 @@
+import pygame
+
+
+# When set, the game runs on virtual time that only moves when advance() is called
+virtual_ticks = None
+
+
+def get_ticks():
+    """
+    Milliseconds of game time. This is pygame's real clock unless a virtual
+    clock was started for headless runs, where the simulation steps faster
+    than real time but cooldowns and animations still need 60 FPS timing.
+    """
+    if virtual_ticks is None:
+        return pygame.time.get_ticks()
+    return int(virtual_ticks)
+
+
+def use_virtual_clock(start=0):
+    global virtual_ticks
+    virtual_ticks = start
+
+
+def use_real_clock():
+    global virtual_ticks
+    virtual_ticks = None
+
+
+def advance(milliseconds):
+    global virtual_ticks
+    if virtual_ticks is not None:
+        virtual_ticks += milliseconds
@@ -0,0 +1,165 @@
+"""
+Run the game logic without drawing anything, as fast as the machine allows.
+
+    python headless.py --level 3 --ticks 20000
+
+Uses SDL's dummy video and audio drivers and the virtual resolution, so it
+works on machines without a display. Game time runs on a virtual clock that
+moves one frame per tick, so cooldowns and animations behave like a real
+60 FPS session while the loop itself runs faster or slower than real time.
+"""
+import os
+
+# Has to be set before settings is imported
+os.environ.setdefault("ZOMBIE_SHOOTER_HEADLESS", "1")
+
+import argparse
+import random
+import time
+
+import gametime
+from main import create_map, update_world, update_zombies, open_window
+from player import Player, reset_gun_info
+from horde import Horde, HORDE_AVAILABLE
+from pathfinding import FlowField
+from broadphase import Broadphase
+from crowd import Crowd
+from vision import Vision
+from parallel import ParallelAI
+from world import zombies_left
+from settings import (actual_screen_width, actual_screen_height, FPS, MAX_LEVEL,
+                      USE_HORDE_ENGINE, USE_FLOW_FIELD, ZOMBIE_SEPARATION, ZOMBIE_VISION, AI_WORKERS)
+
+
+FRAME_TIME = 1000 / FPS  # Milliseconds of game time per tick
+
+
+class ScriptedInput:
+    """
+    Plays the game like a restless player: walks in a random direction for a
+    while, fires every few ticks and reloads when the magazine runs dry.
+    Seeded so every run makes the same choices.
+    """
+
+    def __init__(self, seed=0, fire_every=8):
+        self.random = random.Random(seed)
+        self.fire_every = fire_every
+        self.direction = "None"
+        self.hold = 0
+        self.tick = 0
+
+    def next(self, player):
+        if self.hold <= 0:
+            self.direction = self.random.choice(["up", "down", "left", "right", "None"])
+            self.hold = self.random.randint(10, 60)
+        self.hold -= 1
+        self.tick += 1
+
+        shoot = self.tick % self.fire_every == 0
+        reload = player.can_shoot and not player.isReloading and self.random.random() < 0.02
+        return self.direction, shoot, reload
+
+
+class Simulation:
+    """
+    The update half of the main loop: pickups, player movement, bullets,
+    zombie movement and contact damage, with no camera or drawing.
+    """
+
+    def __init__(self, level=1):
+        open_window()  # The images are converted for the display, even when it is a dummy one
+        gametime.use_virtual_clock()
+        self.horde = Horde() if USE_HORDE_ENGINE and HORDE_AVAILABLE else None
+        self.flow_field = FlowField() if USE_FLOW_FIELD else None
+        self.broadphase = Broadphase()
+        self.crowd = Crowd() if ZOMBIE_SEPARATION else None
+        self.vision = Vision() if ZOMBIE_VISION else None
+        self.parallel_ai = ParallelAI(AI_WORKERS) if AI_WORKERS else None
+        self.ticks = 0
+        self.load_level(level)
+
+    def load_level(self, level):
+        self.level = level
+        self.walls, player_start, self.zombies, self.pickups, self.guns, self.dead_body, self.blood = create_map(level)
+        reset_gun_info()
+        self.player = Player(actual_screen_width, actual_screen_height)
+        self.player.x, self.player.y = player_start
+        self.dead_zombie_list = []
+        self.last_hit_time = gametime.get_ticks()
+        self.game_over = False
+        self.won = False
+
+    def step(self, direction="None", shoot=False, reload=False):
+        player = self.player
+        if shoot:
+            player.shoot()
+        if reload:
+            player.reload()
+
+        if not self.game_over:
+            update_world(player, direction, self.walls, self.zombies, self.pickups, self.guns, self.dead_zombie_list,
+                         broadphase=self.broadphase)
+
+            # Check win/lose conditions
+            if player.health <= 0:
+                self.game_over = True
+                player.alive = False
+            elif zombies_left(self.walls, self.zombies) == 0:
+                self.won = True
+                self.game_over = True
+
+        self.last_hit_time = update_zombies(player, self.walls, self.zombies, self.last_hit_time, self.horde, self.flow_field,
+                                            self.broadphase, self.crowd, vision=self.vision,
+                                            parallel_ai=self.parallel_ai)
+
+        gametime.advance(FRAME_TIME)
+        self.ticks += 1
+
+    def next_level(self):
+        # Move on after a win or start the level again after dying, like a soak test would.
+        # A map loaded from a file is played again after a win too
+        if self.won and not isinstance(self.level, str):
+            self.load_level(self.level % MAX_LEVEL + 1)
+        else:
+            self.load_level(self.level)
+
+
+def run(level=1, ticks=10000, seed=0, soak=False):
+    random.seed(seed)
+    simulation = Simulation(level)
+    script = ScriptedInput(seed)
+
+    start = time.perf_counter()
+    while simulation.ticks < ticks:
+        simulation.step(*script.next(simulation.player))
+        if simulation.game_over:
+            if not soak:
+                break
+            simulation.next_level()
+    elapsed = time.perf_counter() - start
+    if simulation.parallel_ai:
+        simulation.parallel_ai.close()
+
+    return {
+        "level": simulation.level,
+        "ticks": simulation.ticks,
+        "seconds": elapsed,
+        "ticks_per_second": simulation.ticks / elapsed if elapsed > 0 else 0.0,
+        "zombies_left": zombies_left(simulation.walls, simulation.zombies),
+        "player_health": simulation.player.health,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the zombie shooter simulation without a display")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--map", help="play this level file instead, like the ones mazegen.py writes")
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--soak", action="store_true", help="keep going through levels and restarts until --ticks")
+    args = parser.parse_args()
+
+    result = run(args.map or args.level, args.ticks, args.seed, args.soak)
+    print(f"Level {result['level']}: {result['ticks']} ticks in {result['seconds']:.2f}s "
+          f"({result['ticks_per_second']:.0f} ticks/s), {result['zombies_left']} zombies left, "
+          f"player health {result['player_health']}")
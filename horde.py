@@ -0,0 +1,194 @@
+import math
+import gametime
+from settings import CELL_SIZE_SCALED, ZOMBIE_SIZE, ZOMBIE_SPEED
+from zombie import ANIMATION_COOLDOWN, load_zombie_frames
+
+# NumPy is optional, without it the zombies move one by one as before
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+HORDE_AVAILABLE = np is not None
+
+# Direction codes used by the direction array
+DIRECTIONS = ["up", "right", "down", "left"]
+UP, RIGHT, DOWN, LEFT = range(4)
+
+
+class Horde:
+    """
+    Struct-of-arrays store for the zombies of a level. Positions, health,
+    direction and animation state live in NumPy arrays and the chase step runs
+    for the whole horde at once, with the same direct -> horizontal -> vertical
+    fallback as Zombie.move_towards_player.
+
+    The Zombie objects are kept in sync after every step so bullets, drawing
+    and contact damage keep working on them unchanged.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE_SCALED, size=ZOMBIE_SIZE, speed=ZOMBIE_SPEED):
+        if np is None:
+            raise RuntimeError("The horde engine needs numpy installed")
+        self.cell_size = cell_size
+        self.size = size
+        self.speed = speed
+        # How many cells a zombie box can touch on each axis, plus one either side
+        self.span = int(math.ceil(size / cell_size)) + 2
+
+        self.zombies = None
+        self.walls = None
+        self.walls_version = -1
+        self.solid = np.zeros((0, 0), dtype=bool)
+
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.health = np.zeros(0)
+        self.direction = np.zeros(0, dtype=np.int8)
+        self.frame_index = np.zeros(0, dtype=np.int32)
+        self.update_time = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.x)
+
+    def load(self, zombies):
+        # Gather the state of every zombie into the arrays
+        self.zombies = zombies
+        self.x = np.array([zombie.x for zombie in zombies], dtype=float)
+        self.y = np.array([zombie.y for zombie in zombies], dtype=float)
+        self.health = np.array([zombie.health for zombie in zombies], dtype=float)
+        self.direction = np.array([DIRECTIONS.index(zombie.direction) for zombie in zombies], dtype=np.int8)
+        self.frame_index = np.array([zombie.frame_index for zombie in zombies], dtype=np.int32)
+        self.update_time = np.array([zombie.update_time for zombie in zombies], dtype=np.int64)
+
+    def load_walls(self, walls):
+        self.walls = walls
+        self.walls_version = walls.version
+        self.solid = np.zeros((max(walls.rows, 1), max(walls.cols, 1)), dtype=bool)
+        for wall, _ in walls:
+            cx = int(round(wall.x / self.cell_size))
+            cy = int(round(wall.y / self.cell_size))
+            if 0 <= cy < self.solid.shape[0] and 0 <= cx < self.solid.shape[1]:
+                self.solid[cy, cx] = True
+
+    def forget(self):
+        # Gather the arrays again next step, for a list that changed without changing length
+        self.zombies = None
+
+    def sync(self, zombies, walls):
+        # A new level or a killed zombie means the arrays have to be gathered again
+        if zombies is not self.zombies or len(zombies) != len(self.x):
+            self.load(zombies)
+        else:
+            self.health = np.array([zombie.health for zombie in zombies], dtype=float)
+
+        # A broken wall changes the blocking grid
+        if walls is not self.walls or walls.version != self.walls_version:
+            self.load_walls(walls)
+
+    def blocked(self, x, y):
+        """
+        Return which zombie boxes at (x, y) overlap a wall, using the same
+        strict overlap test the wall grid uses.
+        """
+        cs = self.cell_size
+        size = self.size
+        rows, cols = self.solid.shape
+        first_x = np.floor(x / cs).astype(np.int64) - 1
+        first_y = np.floor(y / cs).astype(np.int64) - 1
+        result = np.zeros(len(x), dtype=bool)
+
+        for oy in range(self.span):
+            cell_y = first_y + oy
+            wall_y = cell_y * cs
+            row_hit = (y + size > wall_y) & (y < wall_y + cs) & (cell_y >= 0) & (cell_y < rows)
+            for ox in range(self.span):
+                cell_x = first_x + ox
+                wall_x = cell_x * cs
+                hit = row_hit & (x + size > wall_x) & (x < wall_x + cs) & (cell_x >= 0) & (cell_x < cols)
+                result |= hit & self.solid[np.clip(cell_y, 0, rows - 1), np.clip(cell_x, 0, cols - 1)]
+        return result
+
+    def step(self, player, walls, zombies, flow_field=None, pushes=None, active=None):
+        """
+        Move every zombie one step towards the player and advance its animation.
+        pushes are the separation pushes from crowd.Crowd, one per zombie, and
+        active says which zombies chase at all, all of them when it is None.
+        """
+        self.sync(zombies, walls)
+        if len(self.x) == 0:
+            return
+
+        target_x = np.full(len(self.x), float(player.x))
+        target_y = np.full(len(self.y), float(player.y))
+        if flow_field and flow_field.walls is not None:
+            waypoint_x, waypoint_y, found = flow_field.waypoints(self.x, self.y)
+            target_x = np.where(found, waypoint_x, target_x)
+            target_y = np.where(found, waypoint_y, target_y)
+
+        dx = target_x - self.x
+        dy = target_y - self.y
+        # float_power goes through the same pow() as Python's ** so distances match Zombie bit for bit
+        distance = np.sqrt(np.float_power(dx, 2) + np.float_power(dy, 2))
+        moving = distance > 0
+        if active is not None:
+            moving &= np.array(active, dtype=bool)
+
+        safe_distance = np.where(moving, distance, 1.0)
+        dx = dx / safe_distance * self.speed
+        dy = dy / safe_distance * self.speed
+
+        # Blend in the separation push and scale back to walking speed, like Zombie does
+        if pushes is not None:
+            push = np.array(pushes, dtype=float).reshape(-1, 2)
+            pushed = moving & ((push[:, 0] != 0) | (push[:, 1] != 0))
+            steer_x = dx + push[:, 0] * self.speed
+            steer_y = dy + push[:, 1] * self.speed
+            length = np.sqrt(steer_x * steer_x + steer_y * steer_y)
+            safe_length = np.where(length > 0, length, 1.0)
+            dx = np.where(pushed, steer_x / safe_length * self.speed, dx)
+            dy = np.where(pushed, steer_y / safe_length * self.speed, dy)
+
+        # Try direct movement first, then horizontal only, then vertical only
+        direct = moving & ~self.blocked(self.x + dx, self.y + dy)
+        horizontal = moving & ~direct & ~self.blocked(self.x + dx, self.y)
+        vertical = moving & ~direct & ~horizontal & ~self.blocked(self.x, self.y + dy)
+
+        # Face the way the zombie actually moved
+        direction_x = np.where(dx > 0, RIGHT, LEFT)
+        direction_y = np.where(dy > 0, DOWN, UP)
+        self.direction = np.where(direct, np.where(np.abs(dx) > np.abs(dy), direction_x, direction_y), self.direction)
+        self.direction = np.where(horizontal, direction_x, self.direction).astype(np.int8)
+        self.direction = np.where(vertical, direction_y, self.direction).astype(np.int8)
+
+        self.x = np.where(direct | horizontal, self.x + dx, self.x)
+        self.y = np.where(direct | vertical, self.y + dy, self.y)
+
+        # Advance the animation of zombies that tried to move
+        now = gametime.get_ticks()
+        frame_count = len(load_zombie_frames()["up"])
+        advance = moving & (now - self.update_time > ANIMATION_COOLDOWN)
+        self.update_time = np.where(advance, now, self.update_time)
+        self.frame_index = np.where(advance, (self.frame_index + 1) % frame_count, self.frame_index).astype(np.int32)
+
+        self.write_back(moving)
+
+    def write_back(self, moving):
+        # Copy the new state back onto the Zombie objects that changed
+        frames = load_zombie_frames()
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        directions = self.direction.tolist()
+        frame_indexes = self.frame_index.tolist()
+        update_times = self.update_time.tolist()
+
+        for i in moving.nonzero()[0].tolist():
+            zombie = self.zombies[i]
+            zombie.x = xs[i]
+            zombie.y = ys[i]
+            zombie.direction = DIRECTIONS[directions[i]]
+            zombie.frame_index = frame_indexes[i]
+            zombie.update_time = update_times[i]
+            zombie.image = frames[zombie.direction][zombie.frame_index]
+            zombie.rect.topleft = (zombie.x, zombie.y)
@@ -0,0 +1,142 @@
+"""
+Level compiler. Turns assets/levels/level{N}.json into a small binary file
+that loads without parsing JSON or walking empty cells in Python.
+
+    python levels.py          # compile every level
+    python levels.py 2 3      # compile just these
+
+create_map() compiles on demand, so running this is only needed to ship
+levels precompiled. A compiled level is rebuilt whenever the hash of its
+JSON source no longer matches the one stored in it.
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+from array import array
+
+from settings import levels_dir, level_cache_dir, MAX_LEVEL
+
+
+MAGIC = b"ZSLV"
+FORMAT_VERSION = 1  # Bump when the layout below changes, old files are recompiled
+
+# magic, format version, sha256 of the JSON source, columns, rows, occupied cell count
+HEADER = struct.Struct("<4sH32sIII")
+
+WALL_TILES = (1, 6)  # Unbreakable and breakable walls
+
+
+class CompiledLevel:
+    """
+    A level as flat arrays:
+
+    tiles     one byte per cell, row by row, the same codes as the JSON
+    passable  one byte per cell, 1 where nothing solid stands at load time
+    cells     indexes of every non empty cell in row order, so spawning only
+              visits cells that hold something, in the same order as before
+    """
+
+    def __init__(self, cols, rows, tiles, passable, cells, source_hash=b"\0" * 32):
+        self.cols = cols
+        self.rows = rows
+        self.tiles = tiles
+        self.passable = passable
+        self.cells = cells
+        self.source_hash = source_hash
+
+    @classmethod
+    def from_layout(cls, layout, source_hash=b"\0" * 32):
+        # Rows shorter than the widest one are padded with empty cells
+        cols = max(len(row) for row in layout)
+        rows = len(layout)
+        tiles = bytearray(cols * rows)
+        for y, row in enumerate(layout):
+            tiles[y * cols:y * cols + len(row)] = bytes(row)
+        passable = bytes(0 if tile in WALL_TILES else 1 for tile in tiles)
+        cells = array('I', (index for index, tile in enumerate(tiles) if tile))
+        return cls(cols, rows, bytes(tiles), passable, cells, source_hash)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, source_hash, cols, rows, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        size = cols * rows
+        cells = array('I')
+        if len(data) != HEADER.size + 2 * size + count * cells.itemsize:
+            return None  # Cut short
+        data = memoryview(data)[HEADER.size:]
+        cells.frombytes(data[2 * size:])
+        if sys.byteorder == "big":
+            cells.byteswap()
+        return cls(cols, rows, bytes(data[:size]), bytes(data[size:2 * size]), cells, source_hash)
+
+    def to_bytes(self):
+        cells = array('I', self.cells)
+        if sys.byteorder == "big":
+            cells.byteswap()
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.source_hash, self.cols, self.rows, len(self.cells))
+        return header + self.tiles + self.passable + cells.tobytes()
+
+
+def source_path(level):
+    # Levels are numbered files in the levels folder, or any other json file given by its path
+    if isinstance(level, str):
+        return level
+    return f"{levels_dir}/level{level}.json"
+
+
+def cache_path(level):
+    if isinstance(level, str):
+        # A short hash of the full path in the name, so files of the same name in other
+        # folders don't keep recompiling over each other's cache
+        name = os.path.splitext(os.path.basename(level))[0]
+        path_hash = hashlib.sha256(os.path.abspath(level).encode()).hexdigest()[:8]
+        return f"{level_cache_dir}/{name}_{path_hash}.bin"
+    return f"{level_cache_dir}/level{level}.bin"
+
+
+def compile_level(level):
+    # Compile the JSON level and write it to the cache, returns the compiled level
+    with open(source_path(level), "rb") as file:
+        source = file.read()
+    compiled = CompiledLevel.from_layout(json.loads(source), hashlib.sha256(source).digest())
+
+    try:
+        os.makedirs(level_cache_dir, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves half a level behind
+        temp_path = cache_path(level) + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(compiled.to_bytes())
+        os.replace(temp_path, cache_path(level))
+    except OSError:
+        pass  # Read only install, the level still loads, just without the cache
+    return compiled
+
+
+def load_level(level):
+    """
+    The compiled level, straight from the cache when its source hash still
+    matches the JSON file, otherwise compiled again. level is a level number
+    or the path of a level file, like the ones mazegen.py writes.
+    """
+    with open(source_path(level), "rb") as file:
+        source_hash = hashlib.sha256(file.read()).digest()
+
+    try:
+        with open(cache_path(level), "rb") as file:
+            compiled = CompiledLevel.from_bytes(file.read())
+    except (OSError, struct.error):
+        compiled = None
+
+    if compiled is None or compiled.source_hash != source_hash:
+        compiled = compile_level(level)
+    return compiled
+
+
+if __name__ == "__main__":
+    for level in [int(arg) for arg in sys.argv[1:]] or range(1, MAX_LEVEL + 1):
+        compiled = compile_level(level)
+        print(f"level{level}: {compiled.cols}x{compiled.rows}, {len(compiled.cells)} cells -> {cache_path(level)}")
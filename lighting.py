@@ -0,0 +1,58 @@
+import math
+import pygame
+from settings import LIGHTING_QUALITY, LOW_QUALITY_LIGHT_SCALE
+
+
+DARKNESS = (0, 0, 0, 250)
+
+
+def create_fading_torch(radius):
+    torch_surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+    for i in range(radius, 0, -1):
+        alpha = int(255 * (i / radius))  # Gradually reduce alpha
+        color = (0, 0, 0, 255 - alpha)  # Darken towards the edge
+        pygame.draw.circle(torch_surface, color, (radius, radius), i)
+    return torch_surface
+
+
+class Lighting:
+    """
+    Keeps the darkness overlay between frames instead of allocating and
+    filling a new full screen surface every frame. Only the area the torch
+    left and the area it moved to are redrawn.
+
+    On "low" quality the light is worked out on a smaller buffer that is
+    scaled up to the screen whenever it changes.
+    """
+
+    def __init__(self, width, height, radius, quality=LIGHTING_QUALITY):
+        self.width = width
+        self.height = height
+        self.scale = 1 if quality == "high" else LOW_QUALITY_LIGHT_SCALE
+
+        buffer_size = (math.ceil(width * self.scale), math.ceil(height * self.scale))
+        self.buffer = pygame.Surface(buffer_size, pygame.SRCALPHA)
+        self.buffer.fill(DARKNESS)
+        self.torch_surface = create_fading_torch(max(1, int(radius * self.scale)))
+
+        self.torch_pos = None
+        self.torch_rect = None
+        self.overlay = self.buffer
+
+    def move_torch(self, x, y):
+        pos = (int(x * self.scale), int(y * self.scale))
+        if pos == self.torch_pos:
+            return False
+
+        # Put back the darkness where the torch was, then cut out the new spot
+        if self.torch_rect:
+            self.buffer.fill(DARKNESS, self.torch_rect)
+        self.torch_rect = self.buffer.blit(self.torch_surface, pos, special_flags=pygame.BLEND_RGBA_SUB)
+        self.torch_pos = pos
+        return True
+
+    def draw(self, screen, x, y):
+        # x, y is the top left of the torch on screen at full resolution
+        if self.move_torch(x, y) and self.scale != 1:
+            self.overlay = pygame.transform.smoothscale(self.buffer, (self.width, self.height))
+        screen.blit(self.overlay, (0, 0))
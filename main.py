@@ -1,21 +1,51 @@
+import time
+startup_start = time.perf_counter()  # The time to the first frame is printed once it's on screen
+
+import threading
+import argparse
 import pygame
-from zombie import Zombie, ZOMBIE_SIZE
-import random, json
-from player import Player, gun_info, unchanged_details
+import gametime
+from zombie import Zombie
+import random
+from player import Player, gun_info, reset_gun_info
+from spatial import WallGrid
+from broadphase import Broadphase
+from crowd import Crowd
+from vision import Vision
+from parallel import ParallelAI
+from levels import load_level, CompiledLevel
+from preload import LevelPreloader
+from horde import Horde, HORDE_AVAILABLE
+from pathfinding import FlowField
+from world import World, cell_lists, zombies_left
+from rendering import WallLayer
+from lighting import Lighting
+from sounds import sound_bank
+from assets import assets
+from profiler import FrameProfiler
+from replay import Recording, encode_input, decode_input, settings_checksum, state_checksum
 from settings import *
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
+screen = None  # The game window, opened by open_window()
+
 
+def open_window():
+    # Initialize Pygame and create the screen with the device resolution. Not done on import,
+    # so the tools and the spawned AI workers can import this module without opening a window
+    global screen
+    if screen is None:
+        pygame.init()
+        pygame.mixer.init()
+        screen = pygame.display.set_mode((actual_screen_width, actual_screen_height))
+        pygame.display.set_caption("Zombie Shooter")
+    return screen
 
-# Create the screen with the device resolution
-screen = pygame.display.set_mode((actual_screen_width, actual_screen_height))
-pygame.display.set_caption("Zombie Shooter")
 
+def close_window():
+    global screen
+    pygame.quit()
+    screen = None
 
-background_music = pygame.mixer.Sound(f"{current_path}/assets/sound_effect/background_music.mp3")
-background_music.play(-1)  # Play the background music on loop
 
 
 
@@ -25,10 +55,34 @@ class Camera:
         self.width = width
         self.height = height
 
+        # How many entities were drawn and skipped this frame
+        self.drawn = 0
+        self.culled = 0
+
     def apply(self, entity):
         # Adjust the position of an entity based on the camera offset
         return entity.rect.move(self.camera.topleft)
 
+    def visible_rect(self, margin=0):
+        # The part of the world currently on screen, grown by margin on every side
+        return pygame.Rect(-self.camera.x - margin, -self.camera.y - margin, self.width + margin * 2, self.height + margin * 2)
+
+    def is_visible(self, rect, margin=0):
+        return self.visible_rect(margin).colliderect(rect)
+
+    def reset_stats(self):
+        self.drawn = 0
+        self.culled = 0
+
+    def blit(self, screen, image, entity):
+        # Draw an entity with the camera offset, skipping it when it is off screen
+        area = pygame.Rect(entity.rect.topleft, image.get_size())
+        if not self.is_visible(area):
+            self.culled += 1
+            return
+        self.drawn += 1
+        screen.blit(image, self.apply(entity))
+
     def update(self, target):
         # Center the camera on the target (usually the player)
         x = -target.rect.centerx + int(self.width / 2)
@@ -38,13 +92,14 @@ class Camera:
 
 
 class Wall:
+    __slots__ = ("x", "y", "image", "health", "rect")
+
     def __init__(self, x, y, image, health=100):
         self.x = x
         self.y = y
-        self.image = image
+        self.image = image  # Already scaled to the cell size and shared by every wall of this type
         self.health = health  # Health of the wall
         self.rect = pygame.Rect(x, y, CELL_SIZE_SCALED, CELL_SIZE_SCALED)  # Define the rectangle for collision and placement
-        self.image = pygame.transform.scale(self.image, (CELL_SIZE_SCALED, CELL_SIZE_SCALED))  # Scale the image to the cell size
 
     def draw(self, screen, camera=None):
         # Update the rect position to match the wall's current position
@@ -68,9 +123,11 @@ class Button:
         self.rect = pygame.Rect(x, y, width, height)
         self.color = color
         self.text = text
-        self.font = pygame.font.Font(None, 20)
+        self.font = None  # Made on the first draw, the buttons are created before pygame starts
 
     def draw(self, screen):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
         pygame.draw.rect(screen, self.color, self.rect)
         text_surface = self.font.render(self.text, True, WHITE)
         screen.blit(text_surface, text_surface.get_rect(center=self.rect.center))
@@ -113,134 +170,328 @@ movement = {
 
 
 class PickUp:
-    
+    __slots__ = ("x", "y", "height", "width", "image", "amount", "rect")
+
     def __init__(self, x, y, image, height, width, amount=5):
         self.x = x
         self.y = y
         self.height = height
         self.width = width
-        self.image = image.convert_alpha()
-        self.image = pygame.transform.scale(self.image, (self.width, self.height))  # Scale the image to the cell size
+        self.image = image  # Already converted and scaled, pickups of one type share it
         self.amount = amount
         self.rect = self.image.get_rect(topleft=(x, y))  # Add rect for camera compatibility
 
     def draw(self, screen, camera=None):
         if camera:
-            screen.blit(self.image, camera.apply(self))  # Apply camera offset
+            camera.blit(screen, self.image, self)  # Apply camera offset, skipped when off screen
         else:
             screen.blit(self.image, (self.x, self.y))  # Default rendering without camera
 
 
-def create_map(level=1):
-    walls = []
+def create_map(level=1, rng=random):
+    # Load the level from its compiled cache, compiled again when the json changed
+    return build_level(load_level(level), rng)
+
+
+def build_map(maze_layout):
+    # Build a level straight from a list of rows, like the ones in the json files
+    return build_level(CompiledLevel.from_layout(maze_layout))
+
+
+def spawn_cell(cell, world_x, world_y, rng=random):
+    # The entity a level cell code stands for, as it is stored in its list, see world.cell_lists
+    # Walls and pickups of one type all share a single image scaled to their size
+    cell_size = (CELL_SIZE_SCALED, CELL_SIZE_SCALED)
+    item_size = (COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED)
+    gun_size = (COLLECT_ITEM_SIZE_SCALED * 2, COLLECT_ITEM_SIZE_SCALED)
+
+    if cell == 1:  # Wall
+        return (Wall(world_x, world_y, assets.image("wall", cell_size)),"unbreakable")
+    elif cell == 2:  # Ammo pickup
+        return (PickUp(world_x, world_y, assets.image("piston_ammo", item_size, alpha=True), COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "handgun")
+    elif cell == 3:  # Health pickup
+        return PickUp(world_x, world_y, assets.image("health", item_size, alpha=True), COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED)
+    elif cell == 4:  # Zombie
+        return Zombie(world_x, world_y)
+    elif cell == 6:
+        return (Wall(world_x, world_y, assets.image("breakable_wall", cell_size)),"breakable")
+    elif cell == 7:
+        return (PickUp(world_x, world_y, assets.image("akm", gun_size, alpha=True), COLLECT_ITEM_SIZE_SCALED , COLLECT_ITEM_SIZE_SCALED * 2), "akm")
+    elif cell == 8:
+        return (PickUp(world_x, world_y, assets.image("shotgun", gun_size, alpha=True), COLLECT_ITEM_SIZE_SCALED , COLLECT_ITEM_SIZE_SCALED * 2), "shotgun")
+    elif cell == 9:
+        return (PickUp(world_x, world_y, assets.image("shotgun_ammo", item_size, alpha=True), COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "shotgun")
+    elif cell == 10:
+        return (PickUp(world_x, world_y, assets.image("rifle_ammo", item_size, alpha=True), COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "rifle")
+    elif cell == 11:
+        lis = [0,1,2]
+        random_body = rng.choice(lis)
+        img = assets.image(f"dead_body/{random_body}.png", alpha=True)
+        
+        # do a random rotate
+        img = pygame.transform.rotate(img, rng.randint(0, 360))
+        img = pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE))
+        return PickUp(world_x, world_y, img, PLAYER_SIZE, PLAYER_SIZE)
+    elif cell == 12:
+        lis = [1,2,4,5,6]
+        random_body = rng.choice(lis)
+        img = assets.image(f"blood/{random_body}.png", alpha=True)
+        
+        # do a random rotate
+        img = pygame.transform.rotate(img, rng.randint(0, 360))
+        img = pygame.transform.scale(img, (PLAYER_SIZE * 2, PLAYER_SIZE * 2))
+        return PickUp(world_x, world_y, img, PLAYER_SIZE * 2, PLAYER_SIZE * 2)
+    return None
+
+
+def build_level(level, rng=random):
+    # rng picks the dead body and blood decorations, the preloader passes its own
+    if WORLD_STREAMING and level.cols * level.rows >= STREAMING_MIN_CELLS:
+        # Too big to build whole, only the sectors around the player are, see world.World
+        return World(level, spawn_cell, rng).level_map()
+
     zombies = []
     guns = []
     dead_body = []
     blood = []
     pickups = {"ammo": [], "health": []}
     player_start = None
-    
-    # Load the level 1 as json file 
-    with open(f"{current_path}/assets/levels/level{level}.json") as file:
-        maze_layout = json.load(file)
 
-    
-    for y, row in enumerate(maze_layout):
-        for x, cell in enumerate(row):
-            
-            world_x = x * CELL_SIZE_SCALED
-            world_y = y * CELL_SIZE_SCALED
-            
-            if cell == 1:  # Wall
-                walls.append((Wall(world_x, world_y, wall_image),"unbreakable"))
-            elif cell == 2:  # Ammo pickup
-                pickups["ammo"].append((PickUp(world_x, world_y, piston_ammo_image, COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "handgun"))
-            elif cell == 3:  # Health pickup
-                pickups["health"].append(PickUp(world_x, world_y, health_image, COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED))
-            elif cell == 4:  # Zombie
-                zombies.append(Zombie(world_x, world_y))
-            elif cell == 5:  # Player start
-                player_start = (world_x, world_y)
-            elif cell == 6:
-                walls.append((Wall(world_x, world_y, breakable_wall_image),"breakable"))
-            elif cell == 7:
-                guns.append((PickUp(world_x, world_y, akm_image, COLLECT_ITEM_SIZE_SCALED , COLLECT_ITEM_SIZE_SCALED * 2), "akm"))
-            elif cell == 8:
-                guns.append((PickUp(world_x, world_y, shotgun_image, COLLECT_ITEM_SIZE_SCALED , COLLECT_ITEM_SIZE_SCALED * 2), "shotgun"))
-            elif cell == 9:
-                pickups['ammo'].append((PickUp(world_x, world_y, shotgun_ammo_image, COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "shotgun"))
-            elif cell == 10:
-                pickups['ammo'].append((PickUp(world_x, world_y, rifle_ammo_image, COLLECT_ITEM_SIZE_SCALED, COLLECT_ITEM_SIZE_SCALED), "rifle"))
-            elif cell == 11:
-                lis = [0,1,2]
-                random_body = random.choice(lis)
-                img = pygame.image.load(f"{current_path}/assets/images/dead_body/{random_body}.png").convert_alpha()
-                
-                # do a random rotate
-                img = pygame.transform.rotate(img, random.randint(0, 360))
-                dead_body.append(PickUp(world_x, world_y, img, PLAYER_SIZE, PLAYER_SIZE))
-            elif cell == 12:
-                lis = [1,2,4,5,6]
-                random_body = random.choice(lis)
-                img = pygame.image.load(f"{current_path}/assets/images/blood/{random_body}.png").convert_alpha()
-                
-                # do a random rotate
-                img = pygame.transform.rotate(img, random.randint(0, 360))
-                blood.append(PickUp(world_x, world_y, img, PLAYER_SIZE * 2, PLAYER_SIZE * 2))
-            
-                
-    
+    # Walls are stored in a grid so collision checks only look at nearby cells
+    walls = WallGrid(CELL_SIZE_SCALED, level.cols, level.rows)
+    lists = cell_lists(walls, zombies, pickups, guns, dead_body, blood)
+
+    # Only cells holding something are visited, in the same row by row order as the json
+    tiles = level.tiles
+    for index in level.cells:
+        y, x = divmod(index, level.cols)
+        cell = tiles[index]
+
+        world_x = x * CELL_SIZE_SCALED
+        world_y = y * CELL_SIZE_SCALED
+
+        if cell == 5:  # Player start
+            player_start = (world_x, world_y)
+        elif cell in lists:
+            lists[cell].append(spawn_cell(cell, world_x, world_y, rng))
+
     return walls, player_start, zombies, pickups, guns, dead_body, blood
 
 
-def check_pickups(player, pickups, guns):
-    # Check for ammo pickups
-    for ammo,ammotype in pickups["ammo"]:
-        if (player.x < ammo.x + 10 and player.x + PLAYER_SIZE > ammo.x and
-            player.y < ammo.y + 10 and player.y + PLAYER_SIZE > ammo.y):
+def prepare_level(level, rng=random):
+    # Everything a level needs before its first frame, safe to run on the preloader's thread
+    level_map = create_map(level, rng)
+    wall_layer = WallLayer()
+    wall_layer.bake(level_map[0])
+    return level_map, wall_layer
+
+
+def check_pickups(player, pickups, guns, broadphase=None):
+    # Only the pickups under the player are looked at, and taking one never disturbs another
+    if broadphase is None:
+        broadphase = Broadphase()
+
+    for entry in broadphase.touching_items(pickups, guns, player.x, player.y, PLAYER_SIZE, PLAYER_SIZE):
+        kind, item = entry
+        if kind == "ammo":
+            ammotype = item[1]
             if ammotype == "handgun":
                 gun_info['handgun']['ammo'] += 10
             elif ammotype == "rifle":
                 gun_info['rifle']['ammo'] += 10
             elif ammotype == "shotgun":
                 gun_info['shotgun']['ammo'] += 10
-            pickups["ammo"].remove((ammo, ammotype))  # Remove the pickup
-            item_pickup_sound.play()
+            pickups["ammo"].remove(item)  # Remove the pickup
+            sound_bank.play("collect_item", "pickup")
 
-    # Check for health pickups
-    for health in pickups["health"][:]:
-        if (player.x < health.x + 10 and player.x + PLAYER_SIZE > health.x and
-            player.y < health.y + 10 and player.y + PLAYER_SIZE > health.y):
+        elif kind == "health":
             player.health = min(player.health + 20, 100)  # Add health, max 100
-            pickups["health"].remove(health)  # Remove the pickup
-            item_pickup_sound.play()
-    
-    for gun, gun_type in guns[:]:
+            pickups["health"].remove(item)  # Remove the pickup
+            sound_bank.play("collect_item", "pickup")
 
-        if (player.x < gun.x + 10 and player.x + PLAYER_SIZE > gun.x and player.y < gun.y + 10 and player.y + PLAYER_SIZE > gun.y):
+        else:
+            gun_type = item[1]
             if gun_type == "akm":
                 player.isRifle = True
             elif gun_type == "shotgun":
                 player.isShotgun = True
-            guns.remove((gun, gun_type))  # Remove the pickup
-            gun_pickup_sound.play()
-
-
-def create_fading_torch(radius):
-    torch_surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-    for i in range(radius, 0, -1):
-        alpha = int(255 * (i / radius))  # Gradually reduce alpha
-        color = (0, 0, 0, 255 - alpha)  # Darken towards the edge
-        pygame.draw.circle(torch_surface, color, (radius, radius), i)
-    return torch_surface
-
-
-
+            guns.remove(item)  # Remove the pickup
+            sound_bank.play("gun_pickup", "pickup")
+
+        broadphase.remove_item(entry)
+
+
+def update_world(player, direction, walls, zombies, pickups, guns, dead_zombie_list, profiler=None, broadphase=None):
+    # One tick of player logic: pickups, movement, animation state and bullets
+    check_pickups(player, pickups, guns, broadphase)
+    if profiler:
+        profiler.mark("pickups")
+
+    # Move the player
+    player.move(direction, walls)
+    player.update_animation()
+    if profiler:
+        profiler.mark("player")
+
+    # Update bullets
+    player.update_bullets(walls, zombies, dead_zombie_list, broadphase)
+    if profiler:
+        profiler.mark("bullets")
+
+
+def update_zombies(player, walls, zombies, last_hit_time, horde=None, flow_field=None, broadphase=None, crowd=None,
+                   profiler=None, vision=None, parallel_ai=None):
+    # Move every zombie towards the player and hurt the player on contact, returns the last hit time
+    if broadphase is None:
+        broadphase = Broadphase()
+
+    # Streamed levels load sectors around the player and move the far away zombies
+    if walls.world:
+        if walls.world.update(player, flow_field):
+            broadphase.forget()
+            if horde:
+                horde.forget()
+        if profiler:
+            profiler.mark("streaming")
+
+    # Only zombies that have spotted the player chase it
+    active = None
+    if vision:
+        vision.update(player, walls, zombies)
+        active = [zombie.alerted for zombie in zombies]
+    if profiler:
+        profiler.mark("vision")
+
+    # How hard each zombie is pushed away from the ones crowding it
+    pushes = crowd.pushes(zombies, broadphase.zombie_grid(zombies)) if crowd else None
+    if profiler:
+        profiler.mark("separation")
+
+    if flow_field:
+        flow_field.update(player, walls)
+
+    if horde:
+        horde.step(player, walls, zombies, flow_field, pushes, active)
+    elif parallel_ai:
+        parallel_ai.step(player, walls, zombies, flow_field, pushes, active)
+    else:
+        for i, zombie in enumerate(zombies):
+            if active is None or active[i]:
+                zombie.move_towards_player(player, walls, flow_field, pushes[i] if pushes else None)
+
+    # Check for zombie collision with player, only zombies near the player can touch it
+    if broadphase.sync_zombies(zombies).query(player.x, player.y, PLAYER_SIZE, PLAYER_SIZE):
+        if player.health > 0:
+            # Add a timer to prevent playing the sound effect too frequently
+            if gametime.get_ticks() - last_hit_time > 1000:  # 1000 milliseconds = 1 second
+                # Play the random damage sound effect
+                music = random.choice(['1', '2', '3', '4', '5'])
+                sound_bank.play("damage_sound/" + music, "damage")
+                last_hit_time = gametime.get_ticks()
+                player.health -= 20  # Reduce player health on collision
+    return last_hit_time
+
+
+def draw_world(screen, camera, wall_layer, player, walls, zombies, pickups, guns, dead_body, blood, dead_zombie_list, profiler=None):
+    # Draw walls
+    wall_layer.draw(screen, camera, walls)
+    if profiler:
+        profiler.mark("draw walls")
+
+    # Count the entities drawn and culled this frame
+    camera.reset_stats()
+
+    # Draw pickups
+    for ammo,_ in pickups["ammo"]:
+        ammo.draw(screen, camera)
+
+    for health in pickups["health"]:
+        health.draw(screen, camera)
+    
+    # Draw blood
+    for bloods in blood:
+        bloods.draw(screen, camera)
+        
+    # Draw dead body
+    for body in dead_body:
+        body.draw(screen, camera)
+    # Draw guns
+    for gun,_ in guns:
+        gun.draw(screen, camera)
+        
+    # Draw dead zombie
+    for dead_zombie in dead_zombie_list:
+        camera.blit(screen, assets.image("dead_zombie"), dead_zombie)
+    if profiler:
+        profiler.mark("draw items")
+
+    # Draw player
+    player.draw(screen, camera)
+
+    # Draw zombies
+    for zombie in zombies:
+        zombie.draw(screen, camera)
+    if profiler:
+        profiler.mark("draw actors")
+
+    # Draw bullets
+    bullet_view = camera.visible_rect(BULLET_SIZE)
+    for bullet_x, bullet_y in player.bullets.positions():
+        if bullet_view.collidepoint(bullet_x, bullet_y):
+            camera.drawn += 1
+            bullet_pos = (int(bullet_x + camera.camera.x), int(bullet_y + camera.camera.y))
+            pygame.draw.circle(screen, RED, bullet_pos, BULLET_SIZE)
+        else:
+            camera.culled += 1
+    for start_x, start_y, end_x, end_y, _ in player.bullets.tracers:
+        start = (int(start_x + camera.camera.x), int(start_y + camera.camera.y))
+        end = (int(end_x + camera.camera.x), int(end_y + camera.camera.y))
+        pygame.draw.line(screen, WHITE, start, end, max(1, BULLET_SIZE // 2))
+    if profiler:
+        profiler.mark("draw bullets")
+
+
+def draw_darkness(screen, camera, lighting, player):
+    # Blit the darkness overlay with the torchlight centred on the player
+    torch_x = player.x + PLAYER_SIZE // 2 - torch_radius + camera.camera.topleft[0]
+    torch_y = player.y + PLAYER_SIZE // 2 - torch_radius + camera.camera.topleft[1]
+    lighting.draw(screen, torch_x, torch_y)
+
+
+def report_startup(main_start):
+    # How long it took to get the first frame on screen, and what had to be loaded for it
+    now = time.perf_counter()
+    print(f"Startup: imports {(main_start - startup_start) * 1000:.0f}ms, "
+          f"setup {(now - main_start) * 1000:.0f}ms, first frame after {(now - startup_start) * 1000:.0f}ms "
+          f"({assets.load_count} images in {assets.load_time:.0f}ms, {len(sound_bank.sounds)} sounds decoded)")
+
+
+def main(record=None, replay=None, seed=None, realtime=True, timings=None):
+    """
+    Play the game. record is a file to save the session's input to, replay a
+    Recording to play back instead of reading the mouse; either way the game
+    runs on fixed game time from a known seed so it can be replayed exactly.
+    Replays run flat out unless realtime is set, and timings, when a list,
+    gets every frame's stage times. Returns the state checksum at the end of
+    a recorded or replayed session.
+    """
+    main_start = time.perf_counter()
+    screen = open_window()
+    current_level = 1
 
+    recording = replay
+    if record:
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        recording = Recording(seed, actual_screen_width, actual_screen_height, current_level,
+                              settings=settings_checksum())
+    if recording:
+        current_level = recording.level
+        random.seed(recording.seed)
+        gametime.use_virtual_clock()
+    replay_tick = 0
 
-def main():
-    global gun_info
-    current_level = 1
+    music_channel = sound_bank.get("background_music").play(-1)  # Play the background music on loop
+    background = assets.image("background", (actual_screen_width, actual_screen_height))
 
     # Setting all the necessary variables to start the game
     clock = pygame.time.Clock()
@@ -252,166 +503,148 @@ def main():
     game_over = False
     won = False
     death_sound_played = False
-    last_hit_time = pygame.time.get_ticks()
+    last_hit_time = gametime.get_ticks()
     font = pygame.font.Font(None, 36)
     victory_sound_played = False
 
     # This text_width is used to display the zombie count in the right corner of the screen
-    text_for_length = font.render(f"Zombies: {len(zombies)}", True, WHITE)
+    text_for_length = font.render(f"Zombies: {zombies_left(walls, zombies)}", True, WHITE)
     text_width = text_for_length.get_width()
     
     # Initialize the camera
     camera = Camera(actual_screen_width , actual_screen_height, player)
-    bullet_pos = (0, 0)
     
-    # Generate the flashlight gradient
-    torch_surface = create_fading_torch(torch_radius)
+    # Darkness overlay with the flashlight cut out of it
+    lighting = Lighting(actual_screen_width, actual_screen_height, torch_radius)
     
     dead_zombie_list = []
     direction = None
 
+    # Batched zombie movement for big hordes, when numpy is available
+    horde = Horde() if USE_HORDE_ENGINE and HORDE_AVAILABLE else None
+
+    # Walls are baked into big chunks and only the visible ones are drawn
+    wall_layer = WallLayer()
+
+    # Shared path towards the player, only recomputed when the player changes cell
+    flow_field = FlowField() if USE_FLOW_FIELD else None
+
+    # Spatial indexes for zombies and pickups, shared by every overlap check in a tick
+    broadphase = Broadphase()
+
+    # Zombies keep a little room between each other
+    crowd = Crowd() if ZOMBIE_SEPARATION else None
+
+    # Zombies wait in the dark until they spot the player
+    vision = Vision() if ZOMBIE_VISION else None
+
+    # Zombie movement shared out over worker processes, when turned on
+    parallel_ai = ParallelAI(AI_WORKERS) if AI_WORKERS else None
+
+    # Per stage frame timings, shown with F3
+    profiler = FrameProfiler(log=timings)
+
+    # The next level is built on a worker thread while this one is played
+    preloader = LevelPreloader(prepare_level, recording.seed if recording else None)
+    if current_level < MAX_LEVEL:
+        preloader.start(current_level + 1)
 
     while running:
+        profiler.begin_frame()
         
+        # What the player does this tick, packed the same way a recording stores it
+        shoot = reload = False
+        gun = None
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and not replay:
+                profiler.toggle()
+                profiler.begin_frame()
+            elif event.type == pygame.MOUSEBUTTONDOWN and not replay:
                 mouse_pos = pygame.mouse.get_pos()
                 for key, button in buttons.items():
                     if button.is_clicked(mouse_pos):
                         if key in ["up", "down", "left", "right"]:
                             movement[key] = True  # Track movement state
                         elif key == "shoot":
-                            player.shoot()
-                        elif key == "rifle":
-                            player.switch_gun("rifle")
-                        elif key == "handgun":
-                            player.switch_gun("handgun")
-                        elif key == "shotgun":
-                            player.switch_gun("shotgun")
+                            shoot = True
+                        elif key in ["rifle", "handgun", "shotgun"]:
+                            gun = key
                         elif key == "reload":
-                            player.reload()
+                            reload = True
 
             elif event.type == pygame.MOUSEBUTTONUP:
                 mouse_pos = pygame.mouse.get_pos()
                 for key, button in buttons.items():
                     if key in ["up", "down", "left", "right"]:
                         movement[key] = False  # Stop movement
-                            
-
-            # Determine the movement direction
-            direction = "None"
 
-            if movement["up"]:
-                direction = "up"
-            elif movement["down"]:
-                direction = "down"
-            elif movement["left"]:
-                direction = "left"
-            elif movement["right"]:
-                direction = "right"
+        # Determine the movement direction
+        direction = "None"
+
+        if movement["up"]:
+            direction = "up"
+        elif movement["down"]:
+            direction = "down"
+        elif movement["left"]:
+            direction = "left"
+        elif movement["right"]:
+            direction = "right"
+
+        if replay:
+            if replay_tick >= len(replay):
+                break  # The recording is over
+            code = replay.inputs[replay_tick]
+            replay_tick += 1
+        else:
+            code = encode_input(direction, shoot, reload, gun, pygame.key.get_pressed()[pygame.K_r])
+            if record:
+                recording.add(code)
 
+        # Recorded and live input go through the same steps, in this order
+        direction, shoot, reload, gun, restart = decode_input(code)
+        if gun:
+            player.switch_gun(gun)
+        if shoot:
+            player.shoot()
+        if reload:
+            player.reload()
 
+        profiler.mark("events")
 
         # Clear the screen
-        screen.blit(bg_image, (0, 0))
+        screen.blit(background, (0, 0))
         
         
 
         if not game_over:
-            # Check for pickups
-            check_pickups(player, pickups, guns)
-
             # Update the camera to follow the player
             camera.update(player)
 
-            # Move the player
-            player.move(direction, walls)
-            player.update_animation()
-
-            # Update bullets
-            player.update_bullets(walls, zombies, dead_zombie_list)
+            # Pickups, player movement and bullets
+            update_world(player, direction, walls, zombies, pickups, guns, dead_zombie_list, profiler, broadphase)
             
 
             # Check win/lose conditions
             if player.health <= 0:
                 game_over = True
                 player.alive = False
-            elif len(zombies) == 0:
+            elif zombies_left(walls, zombies) == 0:
                 won = True
                 game_over = True
 
-        # Draw walls
-        for wall in walls:
-            wall[0].draw(screen, camera)
-
-        # Draw pickups
-        for ammo,_ in pickups["ammo"]:
-            ammo.draw(screen, camera)
-
-        for health in pickups["health"]:
-            health.draw(screen, camera)
-        
-        # Draw blood
-        for bloods in blood:
-            bloods.draw(screen, camera)
-            
-        # Draw dead body
-        for body in dead_body:
-            body.draw(screen, camera)
-        # Draw guns
-        for gun,_ in guns:
-            gun.draw(screen, camera)
-            
-        # Draw dead zombie
-        for dead_zombie in dead_zombie_list:
-            screen.blit(dead_zombie_image, camera.apply(dead_zombie))
-            
-
+        # Move zombies
+        last_hit_time = update_zombies(player, walls, zombies, last_hit_time, horde, flow_field, broadphase, crowd, profiler,
+                                       vision, parallel_ai)
+        profiler.mark("zombies")
 
-        # Draw player
-        player.draw(screen, camera)
+        # Draw the level, the player and the zombies
+        draw_world(screen, camera, wall_layer, player, walls, zombies, pickups, guns, dead_body, blood, dead_zombie_list, profiler)
 
-        # Draw zombies
-        for zombie in zombies:
-            zombie.move_towards_player(player, walls)
-            zombie.draw(screen, camera)
-            
-            # Check for zombie collision with player
-            if (zombie.x < player.x + PLAYER_SIZE and zombie.x + ZOMBIE_SIZE > player.x and
-                zombie.y < player.y + PLAYER_SIZE and zombie.y + ZOMBIE_SIZE > player.y):
-                if player.health > 0:
-                    # Add a timer to prevent playing the sound effect too frequently
-                    if pygame.time.get_ticks() - last_hit_time > 1000:  # 1000 milliseconds = 1 second
-                        # Play the random damage sound effect
-                        music = random.choice(['1', '2', '3', '4', '5'])
-                        sound = str(current_path) + "/assets/sound_effect/damage_sound/" + music + ".mp3"
-                        pygame.mixer.Sound(sound).play()
-                        last_hit_time = pygame.time.get_ticks()
-                        player.health -= 20  # Reduce player health on collision
-
-        # Draw bullets
-        for bullet in player.bullets:
-            if camera:
-                bullet_pos = (int(bullet["x"] + camera.camera.x), int(bullet["y"] + camera.camera.y))
-            else:
-                bullet_pos = (int(bullet["x"]), int(bullet["y"]))
-            pygame.draw.circle(screen, RED, bullet_pos, BULLET_SIZE)
-            player.update_bullets(walls, zombies, dead_zombie_list)
-
-        # Create the darkness overlay
-        darkness = pygame.Surface((actual_screen_width , actual_screen_height), pygame.SRCALPHA)
-        darkness.fill((0, 0, 0, 250))
-
-        # Blit the torchlight effect onto the darkness overlay
-        torch_x = player.x + PLAYER_SIZE // 2 - torch_radius + camera.camera.topleft[0]
-        torch_y = player.y + PLAYER_SIZE // 2 - torch_radius + camera.camera.topleft[1]
-        
-        darkness.blit(torch_surface, (torch_x, torch_y), special_flags=pygame.BLEND_RGBA_SUB)
-
-        # Apply the darkness overlay to the screen
-        screen.blit(darkness, (0, 0))
+        # Apply the darkness overlay with the torchlight around the player
+        draw_darkness(screen, camera, lighting, player)
+        profiler.mark("darkness")
 
         # Draw HUD (ammo, health)
         ammo_text = font.render(f"Ammo: {gun_info[player.current_gun]['ammo']}", True, WHITE)
@@ -424,7 +657,7 @@ def main():
 
         # display the zombie in area
 
-        zombie_text = font.render(f"Zombies: {len(zombies)}", True, WHITE)
+        zombie_text = font.render(f"Zombies: {zombies_left(walls, zombies)}", True, WHITE)
         screen.blit(zombie_text, (actual_screen_width - text_width, 10))
         
         
@@ -432,6 +665,10 @@ def main():
         
         fps_text = font.render(f"FPS: {int(clock.get_fps())}", True, WHITE)
         screen.blit(fps_text, (10, actual_screen_height - 100))
+
+        # Show how much the culling saved this frame
+        cull_text = font.render(f"Drawn: {camera.drawn}  Culled: {camera.culled}", True, WHITE)
+        screen.blit(cull_text, (10, actual_screen_height - 70))
         
         # Display the current level in the bottom right corner
         level_text = font.render(f"Level: {current_level}", True, WHITE)
@@ -439,62 +676,100 @@ def main():
         # Draw buttons
         for button in buttons.values():
             button.draw(screen)
+        profiler.mark("hud")
 
         # Game over screen
         if not player.alive:
             if not death_sound_played and not won:  # Play death sound only once
-                death_sound.play()
-                loose_sound.play()
+                sound_bank.get("death").play()
+                sound_bank.get("loose").play()
+                if music_channel:
+                    music_channel.fadeout(1000)  # Fade the music out over a second
                 death_sound_played = True
+                preloader.start(1)  # Get the restart map ready while the game over screen is up
             text = "Game Over! Press 'R' to restart"  
             game_over_text = font.render(text, True, WHITE)
             text_rect = game_over_text.get_rect(center=(actual_screen_width / 2, actual_screen_height / 2))
             screen.blit(game_over_text, text_rect)   
             # Check for restart input
-            pygame.mixer.music.fadeout(1000)  # Fade out over 2 seconds
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_r]:
+            if restart:
                 # Reset game state
-                walls, player_start, zombies, pickups, guns, dead_body, blood = create_map()
+                (walls, player_start, zombies, pickups, guns, dead_body, blood), wall_layer = preloader.take(1)
+                if current_level < MAX_LEVEL:
+                    preloader.start(current_level + 1)
                 player = Player(actual_screen_width , actual_screen_height)
                 player.x, player.y = player_start  # Set player's starting position again
-                gun_info = unchanged_details # Reset ammo counts
+                reset_gun_info()  # Reset ammo counts
                 game_over = False
                 won = False
                 death_sound_played = False
                 dead_zombie_list = []
                 
                 # Play the background music again
-                pygame.mixer.music.play(-1)
+                music_channel = sound_bank.get("background_music").play(-1)
                         
         elif won and player.alive:
             text = "You Win!"
             if not victory_sound_played:
-                victory_sound.play()
+                sound_bank.get("victory_sound").play()
                 victory_sound_played = True
                 current_level += 1
             if current_level > MAX_LEVEL:
                 winner_text = font.render("Congratulations! You Completed the game!", True, WHITE)
                 winner_rect = winner_text.get_rect(center=(actual_screen_width / 2, actual_screen_height / 2 + 50))
                 screen.blit(winner_text, winner_rect)
-            else:
-                walls, player_start, zombies, pickups, guns, dead_body, blood = create_map(current_level)
+            elif recording or preloader.ready(current_level):
+                # Swap in the next level once the worker has built it, the win screen stays up until then.
+                # Recorded games wait for it instead, so the swap always happens on the same tick
+                (walls, player_start, zombies, pickups, guns, dead_body, blood), wall_layer = preloader.take(current_level)
                 player.x, player.y = player_start  # Set player's starting position again
                 player.is_Walking_Sound = False
                 game_over = False
                 won = False
                 victory_sound_played = False 
                 dead_zombie_list = []
+                if current_level < MAX_LEVEL:
+                    preloader.start(current_level + 1)
             
             
         
         
+        profiler.mark("game state")
+
+        # Draw the profiler overlay last so it sits on top of everything
+        profiler.draw(screen)
+        profiler.mark("profiler")
+
         # Update the display
         pygame.display.flip()
-        clock.tick(FPS)
-
-    pygame.quit()
+        profiler.mark("flip")
+        if main_start:
+            report_startup(main_start)
+            main_start = None
+            # Everything else loads in the background so the first gunshot or pickup doesn't stall a frame
+            threading.Thread(target=assets.warm, daemon=True).start()
+        profiler.end_frame()
+        if recording:
+            gametime.advance(1000 / FPS)
+        clock.tick(FPS if realtime else 0)
+
+    checksum = None
+    if recording:
+        checksum = state_checksum(current_level, player, zombies)
+    if record:
+        recording.checksum = checksum
+        recording.save(record)
+        print(f"Recorded {len(recording)} ticks to {record}")
+
+    if parallel_ai:
+        parallel_ai.close()
+    close_window()
+    return checksum
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Zombie Shooter")
+    parser.add_argument("--record", metavar="FILE", help="save the input of every tick to FILE, replay it with replay.py")
+    parser.add_argument("--seed", type=int, help="random seed of a recorded game")
+    args = parser.parse_args()
+    main(record=args.record, seed=args.seed)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Maze level generator, for levels far bigger than the hand made ones.
+
+    python mazegen.py 500 500 --zombies 20000 --seed 1
+    python mazegen.py 120 80 --corridor 3 --output assets/levels/level4.json
+
+Writes a level JSON file in the same cell codes as assets/levels, which
+create_map(), headless.py --map, benchmark.py --map and memory.py --map
+load like any other level. Dropped into assets/levels as levelN.json it
+replaces that level in the game. The same size, seed and options always
+give the same file.
+"""
+import os
+
+# Run on its own there is no window, this has to be set before settings is imported
+if __name__ == "__main__":
+    os.environ.setdefault("ZOMBIE_SHOOTER_HEADLESS", "1")
+
+import argparse
+import random
+
+from settings import levels_dir
+
+# Cell codes, the same ones build_level reads
+EMPTY = 0
+WALL = 1
+AMMO = 2
+HEALTH = 3
+ZOMBIE = 4
+PLAYER = 5
+BREAKABLE = 6
+AKM = 7
+SHOTGUN = 8
+SHOTGUN_AMMO = 9
+RIFLE_AMMO = 10
+DEAD_BODY = 11
+BLOOD = 12
+
+STEPS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def generate_maze(cols, rows, seed=0, zombies=100, corridor=2, loops=0.08, breakable=0.04, rooms=None,
+                  pickups=0.004, decals=0.01, safe_radius=6):
+    """
+    A cols x rows level as a list of rows. The maze is a spanning tree of
+    corridor wide passages behind one cell thick walls, so every open cell
+    can be reached from the player start. On top of that a share of the
+    remaining walls between passages is knocked through (loops) or made
+    breakable, and some rectangular rooms are opened up.
+
+    Zombies go on random open cells at least safe_radius cells from the
+    player start in the middle, pickups and decals take the given share
+    of the open cells that are left.
+    """
+    span = corridor + 1
+    maze_cols = (cols - 1) // span
+    maze_rows = (rows - 1) // span
+    if maze_cols < 2 or maze_rows < 2:
+        raise ValueError(f"A {cols}x{rows} level is too small for corridors {corridor} wide")
+
+    rng = random.Random(seed)
+    layout = [[WALL] * cols for _ in range(rows)]
+
+    def open_area(x1, y1, x2, y2, code=EMPTY):
+        # Set every tile from (x1, y1) up to but not including (x2, y2)
+        for y in range(y1, y2):
+            row = layout[y]
+            for x in range(x1, x2):
+                row[x] = code
+
+    def passage(i, j):
+        # Top left tile of a maze cell
+        return 1 + i * span, 1 + j * span
+
+    def wall_between(i, j, ni, nj):
+        # The tiles of the wall between two neighbouring maze cells, as an area
+        x, y = passage(min(i, ni), min(j, nj))
+        if ni != i:
+            return x + corridor, y, x + span, y + corridor
+        return x, y + corridor, x + corridor, y + span
+
+    for j in range(maze_rows):
+        for i in range(maze_cols):
+            x, y = passage(i, j)
+            open_area(x, y, x + corridor, y + corridor)
+
+    # Depth first carving from the middle, a stack instead of recursion so huge mazes fit
+    visited = bytearray(maze_cols * maze_rows)
+    start = (maze_cols // 2, maze_rows // 2)
+    visited[start[1] * maze_cols + start[0]] = 1
+    stack = [start]
+    while stack:
+        i, j = stack[-1]
+        options = [(i + di, j + dj) for di, dj in STEPS
+                   if 0 <= i + di < maze_cols and 0 <= j + dj < maze_rows
+                   and not visited[(j + dj) * maze_cols + i + di]]
+        if not options:
+            stack.pop()
+            continue
+        ni, nj = rng.choice(options)
+        visited[nj * maze_cols + ni] = 1
+        open_area(*wall_between(i, j, ni, nj))
+        stack.append((ni, nj))
+
+    # Extra openings make loops, so hordes come from more than one side
+    for j in range(maze_rows):
+        for i in range(maze_cols):
+            for ni, nj in ((i + 1, j), (i, j + 1)):
+                if ni >= maze_cols or nj >= maze_rows:
+                    continue
+                x1, y1, x2, y2 = wall_between(i, j, ni, nj)
+                if layout[y1][x1] != WALL:
+                    continue
+                roll = rng.random()
+                if roll < loops:
+                    open_area(x1, y1, x2, y2)
+                elif roll < loops + breakable:
+                    open_area(x1, y1, x2, y2, BREAKABLE)
+
+    # Rooms, a few maze cells across with the walls inside them gone
+    if rooms is None:
+        rooms = maze_cols * maze_rows // 150
+    for _ in range(rooms):
+        width = rng.randint(2, min(5, maze_cols))
+        height = rng.randint(2, min(5, maze_rows))
+        i = rng.randrange(maze_cols - width + 1)
+        j = rng.randrange(maze_rows - height + 1)
+        x1, y1 = passage(i, j)
+        x2, y2 = passage(i + width - 1, j + height - 1)
+        open_area(x1, y1, x2 + corridor, y2 + corridor)
+
+    # The player starts in the middle cell, with room around it kept clear of zombies
+    start_x, start_y = passage(*start)
+    layout[start_y][start_x] = PLAYER
+
+    free = [(x, y) for y in range(rows) for x in range(cols) if layout[y][x] == EMPTY]
+    far = [(x, y) for x, y in free if abs(x - start_x) > safe_radius or abs(y - start_y) > safe_radius]
+    spawns = rng.sample(far, min(zombies, len(far)))
+    for x, y in spawns:
+        layout[y][x] = ZOMBIE
+
+    # Guns, ammo and health on some of the open cells left, then blood and bodies
+    free = [(x, y) for x, y in free if layout[y][x] == EMPTY]
+    rng.shuffle(free)
+    guns = max(1, cols * rows // 10000)
+    items = [AKM] * guns + [SHOTGUN] * guns
+    items += [rng.choice([AMMO, AMMO, SHOTGUN_AMMO, RIFLE_AMMO, HEALTH]) for _ in range(int(len(free) * pickups))]
+    items += [rng.choice([DEAD_BODY, BLOOD]) for _ in range(int(len(free) * decals))]
+    for (x, y), item in zip(free, items):
+        layout[y][x] = item
+    return layout
+
+
+def write_level(layout, path):
+    # One row per line, like the hand made levels
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    rows = ",\n".join("    [" + ", ".join(str(cell) for cell in row) + "]" for row in layout)
+    with open(path, "w") as file:
+        file.write("[\n" + rows + "\n]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a maze level for stress testing")
+    parser.add_argument("cols", type=int)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--zombies", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corridor", type=int, default=2, help="width of the passages in cells")
+    parser.add_argument("--loops", type=float, default=0.08, help="share of inner walls knocked through")
+    parser.add_argument("--breakable", type=float, default=0.04, help="share of inner walls made breakable")
+    parser.add_argument("--rooms", type=int, help="open rooms to add, by default one per 150 maze cells")
+    parser.add_argument("--pickups", type=float, default=0.004, help="share of open cells with a pickup")
+    parser.add_argument("--decals", type=float, default=0.01, help="share of open cells with blood or a body")
+    parser.add_argument("--output", help="where to write the level, by default assets/levels/generated/")
+    args = parser.parse_args()
+
+    try:
+        layout = generate_maze(args.cols, args.rows, args.seed, args.zombies, args.corridor, args.loops,
+                               args.breakable, args.rooms, args.pickups, args.decals)
+    except ValueError as error:
+        parser.error(str(error))
+
+    path = args.output or f"{levels_dir}/generated/maze_{args.cols}x{args.rows}_{args.zombies}_s{args.seed}.json"
+    write_level(layout, path)
+    placed = sum(row.count(ZOMBIE) for row in layout)
+    print(f"{args.cols}x{args.rows} maze with {placed} zombies -> {path}")
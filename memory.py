@@ -0,0 +1,128 @@
+"""
+Memory used by the entities of a level, per entity type.
+
+    python memory.py --level 3
+    python memory.py --stress 120 120 2000
+    python memory.py --map assets/levels/generated/maze_500x500_20000_s1.json
+
+On a streamed level only the loaded sectors have entities, the rest of
+the level is reported as the compact level and dormant zombie rows.
+
+Object bytes are the entities themselves plus everything they hold that
+nothing counted before them holds too. Image bytes are the pixel buffers
+they draw with, each surface counted once no matter how many entities
+share it. Numbers come from sys.getsizeof, so they are close estimates
+rather than exact allocator figures.
+"""
+import os
+
+# Has to be set before settings is imported
+os.environ.setdefault("ZOMBIE_SHOOTER_HEADLESS", "1")
+
+import argparse
+import sys
+
+import pygame
+
+
+class MemoryReport:
+    """
+    Adds up entity memory by type. Anything already counted, under any
+    type, is skipped, so shared images and frame tables are only paid for
+    by the first entity that holds them.
+    """
+
+    def __init__(self):
+        self.seen = set()
+        self.rows = {}  # Entity type -> {"count", "object_bytes", "image_bytes"}
+
+    def size_of(self, value, row):
+        # Walk a value, adding what hasn't been counted yet to the row
+        if id(value) in self.seen:
+            return
+        self.seen.add(id(value))
+
+        if isinstance(value, pygame.Surface):
+            # Subsurfaces share their parent's pixels, so the parent is what gets counted
+            surface = value.get_parent() or value
+            row["object_bytes"] += sys.getsizeof(value)
+            if surface is not value:
+                if id(surface) in self.seen:
+                    return
+                self.seen.add(id(surface))
+            row["image_bytes"] += surface.get_width() * surface.get_height() * surface.get_bytesize()
+            return
+
+        row["object_bytes"] += sys.getsizeof(value)
+        if isinstance(value, dict):
+            for key, item in value.items():
+                self.size_of(key, row)
+                self.size_of(item, row)
+        elif isinstance(value, (list, tuple, set)):
+            for item in value:
+                self.size_of(item, row)
+        elif hasattr(value, "__dict__") or hasattr(type(value), "__slots__"):
+            for name in getattr(type(value), "__slots__", ()):
+                if hasattr(value, name):
+                    self.size_of(getattr(value, name), row)
+            if hasattr(value, "__dict__"):
+                self.size_of(value.__dict__, row)
+
+    def add(self, name, entities):
+        row = self.rows.setdefault(name, {"count": 0, "object_bytes": 0, "image_bytes": 0})
+        for entity in entities:
+            row["count"] += 1
+            self.size_of(entity, row)
+        return row
+
+    def add_level(self, level_map):
+        walls, _, zombies, pickups, guns, dead_body, blood = level_map
+        self.add("wall", [wall for wall, _ in walls])
+        self.add("zombie", zombies)
+        self.add("pickup", [ammo for ammo, _ in pickups["ammo"]] + pickups["health"] + [gun for gun, _ in guns])
+        self.add("decoration", dead_body + blood)
+        world = walls.world
+        if world:
+            self.add("compact level", [world.tiles, world.solid, world.wall_health])["count"] = 1
+            self.add("dormant zombie", [world.dormant])["count"] = world.dormant_count
+        return self
+
+    def summary(self):
+        # Rows with per entity figures added, plus a total
+        result = {}
+        for name, row in self.rows.items():
+            result[name] = dict(row, per_entity=(row["object_bytes"] + row["image_bytes"]) / row["count"] if row["count"] else 0)
+        result["total"] = {
+            "count": sum(row["count"] for row in self.rows.values()),
+            "object_bytes": sum(row["object_bytes"] for row in self.rows.values()),
+            "image_bytes": sum(row["image_bytes"] for row in self.rows.values()),
+        }
+        return result
+
+
+def format_report(summary):
+    lines = [f"{'type':<12}{'count':>8}{'objects KB':>12}{'images KB':>12}{'bytes each':>12}"]
+    for name, row in summary.items():
+        each = f"{row['per_entity']:12.0f}" if "per_entity" in row else ""
+        lines.append(f"{name:<12}{row['count']:8d}{row['object_bytes'] / 1024:12.1f}{row['image_bytes'] / 1024:12.1f}{each}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report how much memory the entities of a level use")
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--stress", type=int, nargs=3, metavar=("COLUMNS", "ROWS", "ZOMBIES"),
+                        help="report on a synthetic stress map instead of a level")
+    parser.add_argument("--map", help="report on a level file, like the ones mazegen.py writes")
+    args = parser.parse_args()
+
+    from main import create_map, build_map, open_window
+    open_window()
+    if args.map:
+        level_map = create_map(args.map)
+    elif args.stress:
+        from benchmark import stress_layout
+        level_map = build_map(stress_layout(*args.stress))
+    else:
+        level_map = create_map(args.level)
+    print(format_report(MemoryReport().add_level(level_map).summary()))
@@ -0,0 +1,310 @@
+"""
+Zombie AI spread over worker processes.
+
+    python parallel.py --workers 1 2 4 --zombies 2000 --ticks 200
+
+Without arguments the script plays a stress map with each worker count in
+turn and prints zombie updates per second and the speedup over moving the
+zombies on the main process, checking every run ends with the same zombies.
+"""
+import os
+
+# Run on its own there is no window, this has to be set before settings is imported. Workers
+# inherit it from whatever started them, so they always agree with the game on sizes and speeds
+if __name__ == "__main__":
+    os.environ.setdefault("ZOMBIE_SHOOTER_HEADLESS", "1")
+
+import argparse
+import multiprocessing
+import time
+from array import array
+from multiprocessing import shared_memory
+
+from spatial import WallGrid
+from pathfinding import FlowField
+from zombie import chase_step
+from settings import AI_WORKERS
+
+# Doubles stored per zombie: x, y, push x, push y, active, new x, new y, new direction
+FIELDS = 8
+DIRECTIONS = ["up", "right", "down", "left"]
+NO_STEP = -1.0  # New direction code of a zombie that didn't take a step
+
+
+class Block:
+    # Stands in for a Wall in the workers' copy of the wall grid, only the position matters
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def worker_loop(connection):
+    """
+    Runs in each worker process: waits for a slice of the horde, steps those
+    zombies with chase_step and writes the results next to their inputs.
+    """
+    segments = {}
+    walls = None
+    level = None  # (level segment name, version) the wall grid was built from
+    flow_field = FlowField()
+
+    while True:
+        command = connection.recv()
+        if command is None:
+            break
+        (zombie_name, level_name, flow_name, cols, rows, cell_size, level_version, has_flow,
+         player_x, player_y, start, end) = command
+
+        # Spawned workers share the game's resource tracker, so the game alone unlinks segments
+        for name in (zombie_name, level_name, flow_name):
+            if name not in segments:
+                segments[name] = shared_memory.SharedMemory(name=name)
+        # Segments the game let go of are closed here too
+        for name in list(segments):
+            if name not in (zombie_name, level_name, flow_name):
+                segments.pop(name).close()
+
+        if level != (level_name, level_version):
+            solid = segments[level_name].buf
+            walls = WallGrid(cell_size, cols, rows)
+            for index in range(cols * rows):
+                if solid[index]:
+                    cy, cx = divmod(index, cols)
+                    walls.append((Block(cx * cell_size, cy * cell_size), "wall"))
+            level = (level_name, level_version)
+
+        flow = None
+        if has_flow:
+            # The distances are read straight out of shared memory
+            flow_field.walls = walls
+            flow_field.distance = segments[flow_name].buf.cast("i")
+            flow = flow_field
+
+        data = segments[zombie_name].buf.cast("d")
+        for i in range(start, end):
+            base = i * FIELDS
+            if not data[base + 4]:
+                data[base + 7] = NO_STEP
+                continue
+            push = (data[base + 2], data[base + 3])
+            step = chase_step(data[base], data[base + 1], None, player_x, player_y, walls, flow, push)
+            if step is None:
+                data[base + 7] = NO_STEP
+                continue
+            data[base + 5], data[base + 6] = step[0], step[1]
+            # A zombie boxed in on every side keeps its direction, which the game fills back in
+            data[base + 7] = DIRECTIONS.index(step[2]) if step[2] else len(DIRECTIONS)
+        if has_flow:
+            flow_field.distance.release()
+        data.release()
+        connection.send(end - start)
+
+    for segment in segments.values():
+        segment.close()
+
+
+class ParallelAI:
+    """
+    Moves the zombies on a pool of worker processes. Zombie positions, the
+    separation pushes, the wall grid and the flow field distances live in
+    shared memory; each worker gets a fixed slice of the horde, steps it
+    with the same chase_step as Zombie.move_towards_player and writes the
+    results into its own slots.
+
+    Every zombie's step only depends on where things stood at the start of
+    the tick, and the results are applied in list order once all workers
+    are done, so the game plays out exactly the same with any number of
+    workers, or none.
+    """
+
+    def __init__(self, workers=AI_WORKERS):
+        self.workers = max(1, workers)
+        # Spawned rather than forked so the workers don't inherit the display and mixer
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for _ in range(self.workers):
+            ours, theirs = context.Pipe()
+            process = context.Process(target=worker_loop, args=(theirs,), daemon=True)
+            process.start()
+            self.connections.append(ours)
+            self.processes.append(process)
+
+        self.zombie_segment = None
+        self.capacity = 0
+        self.level_segment = None
+        self.flow_segment = None
+        self.walls = None
+        self.walls_version = -1
+        self.level_version = 0
+        self.flow_field = None
+        self.flow_revision = -1
+
+    def reserve(self, count):
+        # Grow the zombie segment to hold at least count zombies
+        if count <= self.capacity:
+            return
+        old = self.zombie_segment
+        self.capacity = max(count, self.capacity * 2, 64)
+        self.zombie_segment = shared_memory.SharedMemory(create=True, size=self.capacity * FIELDS * 8)
+        if old:
+            old.close()
+            old.unlink()
+
+    def sync_level(self, walls, flow_field):
+        # Copy the walls and the flow field over when they changed
+        size = max(walls.cols * walls.rows, 1)
+        if walls is not self.walls:
+            for segment in (self.level_segment, self.flow_segment):
+                if segment:
+                    segment.close()
+                    segment.unlink()
+            self.level_segment = shared_memory.SharedMemory(create=True, size=size)
+            self.flow_segment = shared_memory.SharedMemory(create=True, size=size * 4)
+            self.walls = walls
+            self.walls_version = -1
+            self.flow_revision = -1
+
+        if walls.version != self.walls_version:
+            solid = bytearray(size)
+            for cx, cy in walls.cells:
+                if 0 <= cx < walls.cols and 0 <= cy < walls.rows:
+                    solid[cy * walls.cols + cx] = 1
+            self.level_segment.buf[:size] = solid
+            self.walls_version = walls.version
+            self.level_version += 1
+
+        has_flow = bool(flow_field and flow_field.walls is walls)
+        if has_flow and (flow_field is not self.flow_field or flow_field.revision != self.flow_revision):
+            distances = self.flow_segment.buf.cast("i")
+            distances[:len(flow_field.distance)] = array("i", flow_field.distance)
+            distances.release()
+            self.flow_field = flow_field
+            self.flow_revision = flow_field.revision
+        return has_flow
+
+    def step(self, player, walls, zombies, flow_field=None, pushes=None, active=None):
+        """
+        Move every zombie one step towards the player on the workers and
+        advance the animation of the ones that moved, like the serial loop.
+        """
+        count = len(zombies)
+        if count == 0:
+            return
+        self.reserve(count)
+        has_flow = self.sync_level(walls, flow_field)
+
+        data = self.zombie_segment.buf.cast("d")
+        for i, zombie in enumerate(zombies):
+            base = i * FIELDS
+            data[base] = zombie.x
+            data[base + 1] = zombie.y
+            if pushes:
+                data[base + 2], data[base + 3] = pushes[i]
+            else:
+                data[base + 2] = data[base + 3] = 0.0
+            data[base + 4] = 1.0 if active is None or active[i] else 0.0
+
+        # Equal slices in list order, the last worker takes the remainder
+        size = -(-count // self.workers)
+        busy = []
+        for index, connection in enumerate(self.connections):
+            start = index * size
+            end = min(start + size, count)
+            if start >= end:
+                break
+            connection.send((self.zombie_segment.name, self.level_segment.name, self.flow_segment.name,
+                             walls.cols, walls.rows, walls.cell_size, self.level_version, has_flow,
+                             player.x, player.y, start, end))
+            busy.append(connection)
+        for connection in busy:
+            connection.recv()
+
+        # Apply the results in list order
+        for i, zombie in enumerate(zombies):
+            base = i * FIELDS
+            code = data[base + 7]
+            if code == NO_STEP:
+                continue
+            zombie.x = data[base + 5]
+            zombie.y = data[base + 6]
+            if code < len(DIRECTIONS):
+                zombie.direction = DIRECTIONS[int(code)]
+            zombie.update_direction()
+            zombie.rect.topleft = (zombie.x, zombie.y)
+        data.release()
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for segment in (self.zombie_segment, self.level_segment, self.flow_segment):
+            if segment:
+                segment.close()
+                segment.unlink()
+        self.connections = []
+        self.processes = []
+        self.zombie_segment = self.level_segment = self.flow_segment = None
+
+
+def measure(workers, layout, ticks, seed):
+    # Zombie updates per second with the given number of workers, 0 moves them on this process
+    import random
+    import gametime
+    from main import build_map, update_zombies, open_window
+    from player import Player
+    from broadphase import Broadphase
+    from crowd import Crowd
+
+    open_window()
+    random.seed(seed)
+    gametime.use_virtual_clock()
+    walls, player_start, zombies, *_ = build_map(layout)
+    player = Player(100, 100)
+    player.x, player.y = player_start
+    flow_field = FlowField()
+    broadphase = Broadphase()
+    crowd = Crowd()
+    ai = ParallelAI(workers) if workers else None
+
+    try:
+        # One tick to start the workers and copy the level over before timing
+        update_zombies(player, walls, zombies, 0, None, flow_field, broadphase, crowd, parallel_ai=ai)
+        start = time.perf_counter()
+        for _ in range(ticks):
+            update_zombies(player, walls, zombies, 0, None, flow_field, broadphase, crowd, parallel_ai=ai)
+            gametime.advance(1000 / 60)
+        elapsed = time.perf_counter() - start
+    finally:
+        if ai:
+            ai.close()
+    return len(zombies) * ticks / elapsed, [(zombie.x, zombie.y, zombie.direction) for zombie in zombies]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report how zombie AI throughput scales with worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", type=int, nargs=2, default=[120, 120], metavar=("COLUMNS", "ROWS"))
+    parser.add_argument("--zombies", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from benchmark import stress_layout
+    layout = stress_layout(args.size[0], args.size[1], args.zombies, args.seed)
+    print(f"{os.cpu_count()} cores, {args.zombies} zombies on {args.size[0]}x{args.size[1]}, {args.ticks} ticks")
+
+    serial, expected = measure(0, layout, args.ticks, args.seed)
+    print(f"{'workers':>8}{'updates/s':>14}{'speedup':>10}  same result")
+    print(f"{'serial':>8}{serial:14.0f}{1.0:10.2f}  -")
+    for workers in args.workers:
+        throughput, result = measure(workers, layout, args.ticks, args.seed)
+        print(f"{workers:8d}{throughput:14.0f}{throughput / serial:10.2f}  {'yes' if result == expected else 'NO'}")
@@ -0,0 +1,166 @@
+from collections import deque
+from settings import PLAYER_SIZE, ZOMBIE_SIZE
+
+# NumPy is optional, it is only used to sample the field for the whole horde at once
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+UNREACHABLE = -1
+
+# Neighbour offsets, the order decides ties between equally short paths
+NEIGHBOURS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+
+
+class FlowField:
+    """
+    Breadth first distance map from the player's cell over the open cells of
+    the level. Every zombie reads its next cell from it in constant time.
+
+    The field is only rebuilt when the player walks into another cell. When a
+    breakable wall is destroyed the freed cell is patched in without starting
+    over. On a streamed level it only spreads as far as the world's
+    path_range, zombies further away have no path and wait.
+    """
+
+    def __init__(self):
+        self.walls = None
+        self.target = None
+        self.removed_seen = 0
+        self.limit = None  # Longest path spread, None for the whole level
+        self.distance = []
+        self.revision = 0  # Bumped whenever the distances change
+        self.distance_array = None
+        self.array_revision = -1
+
+    def update(self, player, walls):
+        target = walls.cell_of(player.x + PLAYER_SIZE / 2, player.y + PLAYER_SIZE / 2)
+
+        if walls is not self.walls or target != self.target:
+            self.rebuild(walls, target)
+        elif len(walls.removed_cells) > self.removed_seen:
+            for cell in walls.removed_cells[self.removed_seen:]:
+                self.open_cell(cell)
+            self.removed_seen = len(walls.removed_cells)
+
+    def index(self, cx, cy):
+        return cy * self.walls.cols + cx
+
+    def rebuild(self, walls, target):
+        self.walls = walls
+        self.target = target
+        self.removed_seen = len(walls.removed_cells)
+        self.limit = walls.world.path_range if walls.world else None
+        self.distance = [UNREACHABLE] * (walls.cols * walls.rows)
+        self.revision += 1
+
+        if not walls.is_open(*target):
+            return
+
+        self.distance[self.index(*target)] = 0
+        self.spread(deque([target]))
+
+    def spread(self, queue):
+        # Push shorter distances outwards from every cell in the queue
+        walls = self.walls
+        distance = self.distance
+        cols = walls.cols
+        limit = self.limit
+        while queue:
+            cx, cy = queue.popleft()
+            next_distance = distance[cy * cols + cx] + 1
+            if limit is not None and next_distance > limit:
+                continue
+            for ox, oy in NEIGHBOURS:
+                nx, ny = cx + ox, cy + oy
+                if not walls.is_open(nx, ny):
+                    continue
+                i = ny * cols + nx
+                if distance[i] == UNREACHABLE or next_distance < distance[i]:
+                    distance[i] = next_distance
+                    queue.append((nx, ny))
+
+    def open_cell(self, cell):
+        # A wall was broken, so the cell can only make paths shorter
+        cx, cy = cell
+        if not self.walls.is_open(cx, cy):
+            return
+        best = UNREACHABLE
+        for ox, oy in NEIGHBOURS:
+            d = self.distance_at(cx + ox, cy + oy)
+            if d != UNREACHABLE and (best == UNREACHABLE or d + 1 < best):
+                best = d + 1
+        if best == UNREACHABLE:
+            return
+        self.distance[self.index(cx, cy)] = best
+        self.revision += 1
+        self.spread(deque([cell]))
+
+    def distance_at(self, cx, cy):
+        if not self.walls.is_open(cx, cy):
+            return UNREACHABLE
+        return self.distance[self.index(cx, cy)]
+
+    def next_cell(self, cx, cy):
+        # The neighbouring cell one step closer to the player, or None
+        here = self.distance_at(cx, cy)
+        if here <= 0:
+            return None
+        for ox, oy in NEIGHBOURS:
+            d = self.distance_at(cx + ox, cy + oy)
+            if d != UNREACHABLE and d < here:
+                return cx + ox, cy + oy
+        return None
+
+    def waypoint(self, x, y, size=ZOMBIE_SIZE):
+        """
+        Where a box of the given size at (x, y) should head next: the top left
+        position that centres it in the next cell of its path. None means it is
+        already in the player's cell or cannot reach it.
+        """
+        if self.walls is None:
+            return None
+        cell_size = self.walls.cell_size
+        cell = self.next_cell(*self.walls.cell_of(x + size / 2, y + size / 2))
+        if cell is None:
+            return None
+        return (cell[0] + 0.5) * cell_size - size / 2, (cell[1] + 0.5) * cell_size - size / 2
+
+    def waypoints(self, xs, ys, size=ZOMBIE_SIZE):
+        """
+        NumPy version of waypoint for a whole horde. Returns the target arrays
+        and a mask of the boxes that have a next cell to head for.
+        """
+        walls = self.walls
+        cell_size = walls.cell_size
+        if self.array_revision != self.revision or self.distance_array is None:
+            # Pad the grid with a ring of unreachable cells so neighbours never go out of range
+            grid = np.full((walls.rows + 2, walls.cols + 2), UNREACHABLE, dtype=np.int64)
+            grid[1:-1, 1:-1] = np.array(self.distance, dtype=np.int64).reshape(walls.rows, walls.cols)
+            self.distance_array = grid
+            self.array_revision = self.revision
+
+        grid = self.distance_array
+        rows, cols = grid.shape
+        cx = np.clip(np.floor_divide(xs + size / 2, cell_size).astype(np.int64) + 1, 0, cols - 1)
+        cy = np.clip(np.floor_divide(ys + size / 2, cell_size).astype(np.int64) + 1, 0, rows - 1)
+        here = grid[cy, cx]
+
+        next_x = cx.copy()
+        next_y = cy.copy()
+        found = np.zeros(len(xs), dtype=bool)
+        for ox, oy in NEIGHBOURS:
+            nx = np.clip(cx + ox, 0, cols - 1)
+            ny = np.clip(cy + oy, 0, rows - 1)
+            d = grid[ny, nx]
+            better = ~found & (here > 0) & (d != UNREACHABLE) & (d < here)
+            next_x = np.where(better, nx, next_x)
+            next_y = np.where(better, ny, next_y)
+            found |= better
+
+        # Undo the padding offset before turning cells back into positions
+        target_x = (next_x - 1 + 0.5) * cell_size - size / 2
+        target_y = (next_y - 1 + 0.5) * cell_size - size / 2
+        return target_x, target_y, found
@@ -1,10 +1,10 @@
 import pygame
+import gametime
 import random, copy
 import os, math, pathlib
-from settings import CELL_SIZE_SCALED, ZOMBIE_SIZE, PLAYER_SIZE, BULLET_SPEED, PLAYER_SPEED
-
-
-pygame.mixer.init()
+from settings import PLAYER_SIZE, BULLET_SPEED, PLAYER_SPEED, RIFLE_HITSCAN, HITSCAN_RANGE
+from sounds import sound_bank
+from projectiles import ProjectilePool
 
 
 ANIMATION_COOLDOWN = 100
@@ -13,11 +13,8 @@ ANIMATION_COOLDOWN = 100
 BULLET_SPREAD = 45  # Degrees of spread
 BULLET_COUNT = 6  # Number of bullets per shotgun shot
 
-# Sound effects
 current_path = pathlib.Path().absolute()
 
-walk_sound = pygame.mixer.Sound(str(current_path) +'/assets/sound_effect/player_walk.mp3')
-
 
 
 # Gun information
@@ -29,8 +26,8 @@ gun_info = {
         "magazine": 6,
         "cooldown": 0,
         "remaining_ammo": 6,
-        "sound": str(current_path) +'/assets/sound_effect/gun_sound/handgun.mp3',
-        "reloading_sound" : str(current_path) +'/assets/sound_effect/gun_sound/handgun_reload.mp3'
+        "sound": "gun_sound/handgun",
+        "reloading_sound" : "gun_sound/handgun_reload"
     },
     "rifle": {
         "damage": 50,
@@ -38,8 +35,8 @@ gun_info = {
         "magazine": 20,
         "cooldown": 100,
         "remaining_ammo": 20,
-        "sound": str(current_path) +'/assets/sound_effect/gun_sound/rifle.mp3',
-        "reloading_sound" : str(current_path) +'/assets/sound_effect/gun_sound/rifle_reload.mp3'
+        "sound": "gun_sound/rifle",
+        "reloading_sound" : "gun_sound/rifle_reload"
 
     },
     "shotgun": {
@@ -48,8 +45,8 @@ gun_info = {
         "magazine": 2,
         "cooldown": 1000,
         "remaining_ammo": 2,
-        "sound": str(current_path) +'/assets/sound_effect/gun_sound/shotgun_shot.mp3',
-        "reloading_sound" : str(current_path) +'/assets/sound_effect/gun_sound/shotgun_reload.mp3'
+        "sound": "gun_sound/shotgun_shot",
+        "reloading_sound" : "gun_sound/shotgun_reload"
 
     }
 }
@@ -57,13 +54,77 @@ gun_info = {
 unchanged_details = copy.deepcopy(gun_info)
 
 
+def reset_gun_info():
+    # Full magazines again. Refilled in place since every module shares this one table
+    gun_info.clear()
+    gun_info.update(copy.deepcopy(unchanged_details))
+
+
+GUN_TYPES = ["handgun", "rifle", "shotgun"]
+ANIMATION_TYPES = ["idle", "move", "reload", "shoot"]  # Indexed by Player.action
+DIRECTION_ANGLES = {"right": 0, "up": 90, "left": 180, "down": 270}
+
+player_atlas = {}
+
+
+def load_player_atlas():
+    """
+    Load every player animation frame once and pack it, together with a
+    rotated copy for each direction, into a single atlas surface.
+
+    frames[gun][action][frame][direction] are subsurfaces of that atlas, so
+    every Player shares them by reference and every frame is blitted from
+    the same surface.
+    """
+    if not player_atlas:
+        loaded = {}
+        count = 0
+        for gun in GUN_TYPES:
+            loaded[gun] = []
+            for animation in ANIMATION_TYPES:
+                folder = f'{current_path}/assets/images/player/{gun}/{animation}'
+                images = []
+                for i in range(len(os.listdir(folder))):
+                    img = pygame.image.load(f'{folder}/{i}.png').convert_alpha()
+                    images.append(pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE)))
+                loaded[gun].append(images)
+                count += len(images) * len(DIRECTION_ANGLES)
+
+        # Every frame is square, so each rotation fits a PLAYER_SIZE cell of the atlas
+        columns = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+        atlas = pygame.Surface((columns * PLAYER_SIZE, rows * PLAYER_SIZE), pygame.SRCALPHA).convert_alpha()
+        atlas.fill((0, 0, 0, 0))
+
+        frames = {}
+        cell = 0
+        for gun in GUN_TYPES:
+            frames[gun] = []
+            for images in loaded[gun]:
+                animation_frames = []
+                for img in images:
+                    rotated_images = {}
+                    for direction, angle in DIRECTION_ANGLES.items():
+                        rect = pygame.Rect((cell % columns) * PLAYER_SIZE, (cell // columns) * PLAYER_SIZE, PLAYER_SIZE, PLAYER_SIZE)
+                        # RGBA max onto the cleared atlas copies the pixels as they are, alpha included
+                        atlas.blit(pygame.transform.rotate(img, angle), rect, special_flags=pygame.BLEND_RGBA_MAX)
+                        rotated_images[direction] = atlas.subsurface(rect)
+                        cell += 1
+                    animation_frames.append(rotated_images)
+                frames[gun].append(animation_frames)
+
+        player_atlas["surface"] = atlas
+        player_atlas["frames"] = frames
+    return player_atlas
+
+
 class Player:
     
     def __init__(self, WINDOW_WIDTH, WINDOW_HEIGHT):
         self.alive = True
         self.direction = "right"
-        self.animation_cool_down = pygame.time.get_ticks()
-        self.update_time = pygame.time.get_ticks()
+        self.animation_cool_down = gametime.get_ticks()
+        self.update_time = gametime.get_ticks()
         self.can_shoot = True
         self.isReloading = False
         self.is_Walking_Sound = False
@@ -79,34 +140,13 @@ class Player:
 
         self.ammo = 100
         self.health = 10000
-        self.bullets = []
+        self.bullets = ProjectilePool()
         self.current_gun = "handgun"  # Default gun
         self.isShotgun = False
         self.isRifle = False
 
-        # Initialize animation dictionary
-        self.animation_dict = {}
-
-        # Load animations for each gun
-        gun_types = ["handgun", "rifle", "shotgun"]  # List of all gun types
-        animation_types = ["idle", "move", "reload", "shoot"]  # Animation states
-
-        for gun in gun_types:
-            self.animation_dict[gun] = []  # Initialize an empty list for this gun
-            for animation in animation_types:
-                temp_list = []
-                num_of_frames = len(os.listdir(f'{current_path}/assets/images/player/{gun}/{animation}'))
-                for i in range(num_of_frames):
-                    img = pygame.image.load(f'{current_path}/assets/images/player/{gun}/{animation}/{i}.png').convert_alpha()
-                    img = pygame.transform.scale(img, (PLAYER_SIZE, PLAYER_SIZE))
-                    rotated_images = {
-                        "up": pygame.transform.rotate(img, 90),
-                        "down": pygame.transform.rotate(img, 270),
-                        "left": pygame.transform.rotate(img, 180),
-                        "right": img
-                    }
-                    temp_list.append(rotated_images)
-                self.animation_dict[gun].append(temp_list)
+        # Animation frames are loaded once per process and shared by every player
+        self.animation_dict = load_player_atlas()["frames"]
 
     def switch_gun(self, gun):
         self.current_gun = gun
@@ -122,7 +162,7 @@ class Player:
         if new_action != self.action:
             self.action = new_action
             self.frame_index = 0
-            self.update_time = pygame.time.get_ticks()
+            self.update_time = gametime.get_ticks()
             self.animation_completed = False
             self.isReloading = False
             
@@ -159,28 +199,26 @@ class Player:
         if is_moving:
             self.update_action(1)  # Move animation
             if not self.is_Walking_Sound:
-                walk_sound.play(-1)  # Play walking sound
+                sound_bank.get("player_walk").play(-1)  # Play walking sound
                 self.is_Walking_Sound = True
         else:
             self.update_action(0)  # Idle animation
             if self.is_Walking_Sound:
-                walk_sound.stop()  # Stop walking sound
+                sound_bank.get("player_walk").stop()  # Stop walking sound
                 self.is_Walking_Sound = False
 
         # Wall collision check
-        for wall in walls:
-            if (new_x + PLAYER_SIZE > wall[0].x and new_x < wall[0].x + CELL_SIZE_SCALED and
-                new_y + PLAYER_SIZE > wall[0].y and new_y < wall[0].y + CELL_SIZE_SCALED):
+        if walls.collides(new_x, new_y, PLAYER_SIZE, PLAYER_SIZE):
 
-                # Stop walking sound if colliding with wall
-                if self.is_Walking_Sound:
-                    walk_sound.stop()
-                    self.is_Walking_Sound = False
+            # Stop walking sound if colliding with wall
+            if self.is_Walking_Sound:
+                sound_bank.get("player_walk").stop()
+                self.is_Walking_Sound = False
 
-                if direction in ["up", "down"]:
-                    new_y = self.y
-                if direction in ["left", "right"]:
-                    new_x = self.x
+            if direction in ["up", "down"]:
+                new_y = self.y
+            if direction in ["left", "right"]:
+                new_x = self.x
 
         self.x, self.y = new_x, new_y
         self.rect.topleft = (self.x, self.y)
@@ -188,16 +226,16 @@ class Player:
 
     def shoot(self):
         
-        if gun_info[self.current_gun]["remaining_ammo"] <= 0 and pygame.time.get_ticks() - self.animation_cool_down > 500:
-            pygame.mixer.Sound(str(current_path) +'/assets/sound_effect/gun_sound/empty_gun.mp3').play()
-            self.animation_cool_down = pygame.time.get_ticks()
+        if gun_info[self.current_gun]["remaining_ammo"] <= 0 and gametime.get_ticks() - self.animation_cool_down > 500:
+            sound_bank.play("gun_sound/empty_gun", "gun")
+            self.animation_cool_down = gametime.get_ticks()
             return
         if self.can_shoot and not self.isReloading and gun_info[self.current_gun]["remaining_ammo"] > 0:
             self.can_shoot = False  # Prevent shooting until animation completes
-            if pygame.time.get_ticks() - self.animation_cool_down > gun_info[self.current_gun]["cooldown"]:
+            if gametime.get_ticks() - self.animation_cool_down > gun_info[self.current_gun]["cooldown"]:
                 self.update_action(3)  # Shoot animation
-                self.animation_cool_down = pygame.time.get_ticks()
-                pygame.mixer.Sound(gun_info[self.current_gun]['sound']).play()
+                self.animation_cool_down = gametime.get_ticks()
+                sound_bank.play(gun_info[self.current_gun]['sound'], "gun")
 
 
                 # Calculate bullet direction
@@ -218,22 +256,16 @@ class Player:
                         angle = math.atan2(dy, dx) + math.radians(spread_angle)
                         bullet_dx = math.cos(angle) * BULLET_SPEED
                         bullet_dy = math.sin(angle) * BULLET_SPEED
-                        bullet = {
-                            "x": self.x + PLAYER_SIZE // 2,
-                            "y": self.y + PLAYER_SIZE // 2,
-                            "dx": bullet_dx,
-                            "dy": bullet_dy
-                        }
-                        self.bullets.append(bullet)
+                        self.bullets.spawn(self.x + PLAYER_SIZE // 2, self.y + PLAYER_SIZE // 2,
+                                           bullet_dx, bullet_dy, gun_info[self.current_gun]['damage'])
+                elif self.current_gun == "rifle" and RIFLE_HITSCAN:
+                    # Instant shot, traced through the grid on the next bullet update
+                    self.bullets.spawn_hitscan(self.x + PLAYER_SIZE // 2, self.y + PLAYER_SIZE // 2,
+                                               dx, dy, gun_info[self.current_gun]['damage'], HITSCAN_RANGE)
                 else:
                     # Fire a single bullet
-                    bullet = {
-                        "x": self.x + PLAYER_SIZE // 2,
-                        "y": self.y + PLAYER_SIZE // 2,
-                        "dx": dx * BULLET_SPEED * 2,
-                        "dy": dy * BULLET_SPEED * 2
-                    }
-                    self.bullets.append(bullet)
+                    self.bullets.spawn(self.x + PLAYER_SIZE // 2, self.y + PLAYER_SIZE // 2,
+                                       dx * BULLET_SPEED * 2, dy * BULLET_SPEED * 2, gun_info[self.current_gun]['damage'])
 
                 gun_info[self.current_gun]['remaining_ammo'] -= 1
 
@@ -243,13 +275,13 @@ class Player:
         if (gun_info[self.current_gun]['remaining_ammo'] == gun_info[self.current_gun]['magazine']  or self.isReloading or gun_info[self.current_gun]['ammo'] <= 0):
             return
         self.update_action(2)  # Reload animation
-        pygame.mixer.Sound(gun_info[self.current_gun]['reloading_sound']).play()
+        sound_bank.play(gun_info[self.current_gun]['reloading_sound'], "player")
         self.isReloading = True  # Prevent actions while reloading
         self.can_shoot = False  # Prevent shooting during reload
         
         # Simulate reload delay
-        if pygame.time.get_ticks() - self.animation_cool_down > 200:
-            self.animation_cool_down = pygame.time.get_ticks()
+        if gametime.get_ticks() - self.animation_cool_down > 200:
+            self.animation_cool_down = gametime.get_ticks()
             
             bullets_to_reload = gun_info[self.current_gun]['magazine'] - gun_info[self.current_gun]["remaining_ammo"]
             
@@ -266,43 +298,15 @@ class Player:
             
 
 
-    def update_bullets(self, walls, zombies, dead_zombie_list):
-        bullets_to_remove = []
-        for bullet in self.bullets:
-            bullet["x"] += bullet["dx"]
-            bullet["y"] += bullet["dy"]
-
-            # Check for collisions with walls
-            for wall, wall_type in walls:
-                if (bullet["x"] > wall.x and bullet["x"] < wall.x + CELL_SIZE_SCALED and
-                    bullet["y"] > wall.y and bullet["y"] < wall.y + CELL_SIZE_SCALED):
-                    bullets_to_remove.append(bullet)
-                    if wall_type == "breakable":
-                        isbreak = wall.take_damage(gun_info[self.current_gun]['damage'])  # Reduce wall health
-                        if isbreak:
-                            walls.remove((wall, wall_type))
-                    break
-
-            # Check for collisions with zombies
-            for zombie in zombies[:]:
-                if (bullet["x"] > zombie.x and bullet["x"] < zombie.x + ZOMBIE_SIZE and
-                    bullet["y"] > zombie.y and bullet["y"] < zombie.y + ZOMBIE_SIZE):
-                    zombie.health -= gun_info[self.current_gun]['damage']  # Reduce zombie health
-                    if zombie.health <= 0:
-                        
-                        dead_zombie_list.append(zombie)
-                        # Play a random zombie death sound
-                        random_sound = ['zombie_die1', 'zombie_die2', 'zombie_die3']
-                        sound = random.choice(random_sound)
-                        sound = str(current_path) +"/assets/sound_effect/zombie_die/" + sound + ".mp3"
-                        pygame.mixer.Sound(sound).play()
-                        zombies.remove(zombie)  # Remove the zombie
-                    bullets_to_remove.append(bullet)  # Remove the bullet
-                    break
-
-        # Remove bullets marked for removal
-        for bullet in bullets_to_remove:
-            self.bullets.remove(bullet)
+    def update_bullets(self, walls, zombies, dead_zombie_list, broadphase=None):
+        # Move every bullet once and handle the zombies they killed
+        zombie_grid = broadphase.zombie_grid(zombies) if broadphase else None
+        for zombie in self.bullets.update(walls, zombies, zombie_grid):
+            dead_zombie_list.append(zombie)
+            # Play a random zombie death sound
+            random_sound = ['zombie_die1', 'zombie_die2', 'zombie_die3']
+            sound = random.choice(random_sound)
+            sound_bank.play("zombie_die/" + sound, "zombie")
 
 
     def update_animation(self):
@@ -311,8 +315,8 @@ class Player:
         self.image = self.animation_dict[self.current_gun][self.action][self.frame_index][self.direction]
 
         # Check if enough time has passed since the last update
-        if pygame.time.get_ticks() - self.update_time > ANIMATION_COOLDOWN:
-            self.update_time = pygame.time.get_ticks()
+        if gametime.get_ticks() - self.update_time > ANIMATION_COOLDOWN:
+            self.update_time = gametime.get_ticks()
             self.frame_index += 1
 
             # If the animation has run out
@@ -328,5 +332,5 @@ class Player:
 
     def draw(self, screen, camera=None):
         if not self.alive:
-            walk_sound.stop()
+            sound_bank.get("player_walk").stop()
         screen.blit(self.image, camera.apply(self))  # Apply camera offset and draw
\ No newline at end of file
@@ -0,0 +1,55 @@
+import random
+import threading
+
+
+class LevelPreloader:
+    """
+    Builds a level on a worker thread while the current one is being played,
+    so switching levels only has to swap in objects that already exist.
+
+    load(level, rng) does the actual work. The worker gets its own random
+    generator so it never disturbs the game's shared one. ready() is the
+    non-blocking handoff check for the main loop, take() hands the level over.
+    Several levels can be on their way at once, say the next level and the
+    restart map after the player died.
+    """
+
+    def __init__(self, load, seed=None):
+        self.load = load
+        self.seed = seed  # Recorded games seed the workers too, so levels come out the same every time
+        self.jobs = {}  # Level to its job, still building or done and waiting for take()
+
+    def start(self, level):
+        # Start building the level in the background, unless it's already on its way
+        if level in self.jobs:
+            return
+        job = {"level": level, "result": None, "error": None, "done": threading.Event()}
+        job["thread"] = threading.Thread(target=self.run, args=(job,), daemon=True)
+        self.jobs[level] = job
+        job["thread"].start()
+
+    def run(self, job):
+        try:
+            rng = random.Random() if self.seed is None else random.Random(f"{self.seed}:{job['level']}")
+            job["result"] = self.load(job["level"], rng)
+        except Exception as error:
+            job["error"] = error  # Raised again by take() on the main thread
+        job["done"].set()
+
+    def ready(self, level):
+        # True once the level is built, asking for a level that isn't loading starts it
+        self.start(level)
+        return self.jobs[level]["done"].is_set()
+
+    def take(self, level):
+        """
+        The built level. Waits for the worker if it is still busy, and builds
+        the level right here if nothing was preloaded for it.
+        """
+        job = self.jobs.pop(level, None)
+        if not job:
+            return self.load(level, random)
+        job["done"].wait()
+        if job["error"]:
+            raise job["error"]
+        return job["result"]
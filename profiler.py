@@ -0,0 +1,93 @@
+import time
+from collections import deque
+import pygame
+from settings import FPS
+
+
+HISTORY = 120  # Frames kept for the averages, spikes and graph
+GRAPH_WIDTH = 240
+GRAPH_HEIGHT = 60
+GRAPH_SCALE_MS = 33.3  # Frame time at the top of the graph
+
+
+class FrameProfiler:
+    """
+    Times each stage of the main loop and draws rolling averages, the worst
+    frame of each stage and a small frame time graph. Toggle it with F3.
+
+    Stages are timed by calling mark() after each one finishes, the time since
+    the previous mark goes to that stage. When the profiler is off mark() returns
+    straight away so it costs next to nothing.
+    """
+
+    def __init__(self, history=HISTORY, enabled=False, log=None):
+        self.enabled = enabled or log is not None
+        self.visible = enabled  # The overlay, timing also runs without it when there is a log
+        self.log = log  # When a list, every frame's stage times are appended to it
+        self.history = history
+        self.stages = {}  # Stage name -> deque of milliseconds, in the order stages first ran
+        self.frames = deque(maxlen=history)
+        self.current = {}
+        self.frame_start = 0.0
+        self.last = 0.0
+        self.font = None
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.enabled = self.visible or self.log is not None
+        self.stages = {}
+        self.frames.clear()
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        self.current = {}
+
+    def mark(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[stage] = self.current.get(stage, 0.0) + (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for stage, elapsed in self.current.items():
+            if stage not in self.stages:
+                self.stages[stage] = deque(maxlen=self.history)
+            self.stages[stage].append(elapsed)
+        self.frames.append((self.last - self.frame_start) * 1000)
+        if self.log is not None:
+            self.log.append(dict(self.current, frame=self.frames[-1]))
+
+    def draw(self, screen):
+        if not self.visible or not self.frames:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+
+        lines = [f"{'stage':<12}{'avg ms':>8}{'worst':>8}"]
+        for stage, samples in self.stages.items():
+            lines.append(f"{stage:<12}{sum(samples) / len(samples):8.2f}{max(samples):8.2f}")
+        lines.append(f"{'frame':<12}{sum(self.frames) / len(self.frames):8.2f}{max(self.frames):8.2f}")
+
+        x = screen.get_width() - GRAPH_WIDTH - 10
+        y = 50
+        panel = pygame.Rect(x - 5, y - 5, GRAPH_WIDTH + 10, len(lines) * 16 + GRAPH_HEIGHT + 15)
+        pygame.draw.rect(screen, (0, 0, 0), panel)
+        for line in lines:
+            screen.blit(self.font.render(line, True, (255, 255, 255)), (x, y))
+            y += 16
+
+        # Frame time graph, the green line is the frame budget at the target FPS
+        y += 5
+        budget_y = y + GRAPH_HEIGHT - int(GRAPH_HEIGHT * (1000 / FPS) / GRAPH_SCALE_MS)
+        pygame.draw.line(screen, (0, 255, 0), (x, budget_y), (x + GRAPH_WIDTH, budget_y))
+        bar_width = GRAPH_WIDTH / self.history
+        for i, frame_time in enumerate(self.frames):
+            height = min(GRAPH_HEIGHT, int(GRAPH_HEIGHT * frame_time / GRAPH_SCALE_MS))
+            color = (255, 0, 0) if frame_time > 1000 / FPS else (255, 255, 255)
+            bar_x = x + int(i * bar_width)
+            pygame.draw.line(screen, color, (bar_x, y + GRAPH_HEIGHT), (bar_x, y + GRAPH_HEIGHT - height))
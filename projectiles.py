@@ -0,0 +1,183 @@
+from array import array
+from settings import ZOMBIE_SIZE
+from spatial import traverse_grid, segment_hits_box, EntityGrid
+
+
+INITIAL_CAPACITY = 256
+TRACER_FRAMES = 3  # How long a hitscan shot stays visible
+
+
+class ProjectilePool:
+    """
+    Bullets stored in preallocated parallel arrays instead of one dict each.
+    Dead slots go on a free list and are reused by the next shot, and every
+    live bullet is moved and checked exactly once per tick in a single pass.
+
+    Each step is swept: the segment a bullet covers this tick is walked cell
+    by cell through the level grid and stops at the first wall or zombie, so
+    fast bullets can't skip through corners. Hitscan shots are resolved with
+    one traversal on the next update and leave a short tracer to draw.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.capacity = 0
+        self.x = array('d')
+        self.y = array('d')
+        self.dx = array('d')
+        self.dy = array('d')
+        self.damage = array('d')
+        self.free = []
+        self.live = []  # Slots in use, oldest shot first
+        self.hitscans = []  # Shots waiting to be traced as (x, y, dx, dy, damage, distance)
+        self.tracers = []  # [x0, y0, x1, y1, frames left]
+        self.grow(capacity)
+
+    def __len__(self):
+        return len(self.live)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        for column in (self.x, self.y, self.dx, self.dy, self.damage):
+            column.extend([0.0] * extra)
+        # Hand out low slots first
+        self.free = list(range(capacity - 1, self.capacity - 1, -1)) + self.free
+        self.capacity = capacity
+
+    def spawn(self, x, y, dx, dy, damage):
+        if not self.free:
+            self.grow(self.capacity * 2)
+        slot = self.free.pop()
+        self.x[slot] = x
+        self.y[slot] = y
+        self.dx[slot] = dx
+        self.dy[slot] = dy
+        self.damage[slot] = damage
+        self.live.append(slot)
+        return slot
+
+    def spawn_hitscan(self, x, y, dx, dy, damage, distance):
+        # An instant shot along the unit direction (dx, dy), traced on the next update
+        self.hitscans.append((x, y, dx, dy, damage, distance))
+
+    def clear(self):
+        self.free.extend(reversed(self.live))
+        self.live = []
+        self.hitscans = []
+        self.tracers = []
+
+    def positions(self):
+        # (x, y) of every live bullet, for drawing
+        x, y = self.x, self.y
+        return [(x[slot], y[slot]) for slot in self.live]
+
+    def trace(self, walls, zombie_grid, x0, y0, dx, dy):
+        """
+        First wall or zombie along the segment from (x0, y0) to (x0 + dx, y0 + dy).
+        Returns (t, (Wall, type) or None, zombie or None), or None for a miss.
+        """
+        cell_size = walls.cell_size
+        best = None
+        checked = set()
+
+        for cell_x, cell_y, t_exit in traverse_grid(x0, y0, x0 + dx, y0 + dy, cell_size):
+            for item in walls.cells.get((cell_x, cell_y), ()):
+                wall = item[0]
+                t = segment_hits_box(x0, y0, dx, dy, wall.x, wall.y, wall.x + cell_size, wall.y + cell_size)
+                if t is not None and (best is None or t < best[0]):
+                    best = (t, item, None, -1)
+
+            for zombie in zombie_grid.near_cell(cell_x, cell_y):
+                if id(zombie) in checked:
+                    continue
+                checked.add(id(zombie))
+                t = segment_hits_box(x0, y0, dx, dy, zombie.x, zombie.y, zombie.x + ZOMBIE_SIZE, zombie.y + ZOMBIE_SIZE)
+                if t is None:
+                    continue
+                # Ties go to walls first and then to the zombie earliest in the list
+                order = zombie_grid.order_of(zombie)
+                if best is None or t < best[0] or (t == best[0] and best[2] is not None and order < best[3]):
+                    best = (t, None, zombie, order)
+
+            # Nothing in a later cell can be hit before this one
+            if best is not None and best[0] <= t_exit:
+                break
+
+        return best and best[:3]
+
+    def apply_hit(self, walls, zombie_grid, hit, damage, killed):
+        _, wall_item, zombie = hit
+        if wall_item:
+            wall, wall_type = wall_item
+            if wall_type == "breakable" and wall.take_damage(damage):
+                walls.remove(wall_item)
+        else:
+            zombie.health -= damage
+            zombie.alerted = True  # Getting shot gives the player away
+            if zombie.health <= 0:
+                # Out of the grid straight away so later bullets this tick pass through
+                killed.append(zombie)
+                zombie_grid.remove(zombie)
+
+    def update(self, walls, zombies, zombie_grid=None):
+        """
+        Move every bullet one step and resolve what it hit. Bullets stop at
+        the first wall or zombie in their path; breakable walls and zombies
+        take the bullet's damage. Returns the zombies killed this tick, which
+        have already been taken out of the zombies list and the zombie grid.
+        """
+        for tracer in self.tracers:
+            tracer[4] -= 1
+        self.tracers = [tracer for tracer in self.tracers if tracer[4] > 0]
+
+        if not self.live and not self.hitscans:
+            return []
+
+        cell_size = walls.cell_size
+        if zombie_grid is None:
+            zombie_grid = EntityGrid(cell_size)
+            zombie_grid.rebuild(zombies, ZOMBIE_SIZE, ZOMBIE_SIZE)
+        max_x = walls.cols * cell_size
+        max_y = walls.rows * cell_size
+        world = walls.world
+        killed = []
+
+        # Hitscan shots hit whatever is first along the ray, as far as the ray reaches
+        for x0, y0, dx, dy, damage, distance in self.hitscans:
+            hit = self.trace(walls, zombie_grid, x0, y0, dx * distance, dy * distance)
+            t = 1.0
+            if hit:
+                t = hit[0]
+                self.apply_hit(walls, zombie_grid, hit, damage, killed)
+            self.tracers.append([x0, y0, x0 + dx * distance * t, y0 + dy * distance * t, TRACER_FRAMES])
+        self.hitscans = []
+
+        x, y, dx, dy, damage = self.x, self.y, self.dx, self.dy, self.damage
+        survivors = []
+        for slot in self.live:
+            hit = self.trace(walls, zombie_grid, x[slot], y[slot], dx[slot], dy[slot])
+            x[slot] += dx[slot]
+            y[slot] += dy[slot]
+
+            if hit:
+                self.apply_hit(walls, zombie_grid, hit, damage[slot], killed)
+                self.free.append(slot)
+                continue
+
+            # Bullets that left the level will never hit anything
+            if x[slot] < 0 or y[slot] < 0 or x[slot] > max_x or y[slot] > max_y:
+                self.free.append(slot)
+                continue
+
+            # Nor will ones that left the loaded sectors of a streamed level, the walls out there aren't loaded
+            if world and not world.is_loaded(x[slot], y[slot]):
+                self.free.append(slot)
+                continue
+
+            survivors.append(slot)
+
+        self.live = survivors
+        if killed:
+            # Keep the same list object, other systems hold on to it
+            killed_ids = {id(zombie) for zombie in killed}
+            zombies[:] = [zombie for zombie in zombies if id(zombie) not in killed_ids]
+        return killed
@@ -0,0 +1,90 @@
+import pygame
+
+
+CHUNK_SIZE = 512  # Width and height of a baked wall chunk in pixels
+
+
+class WallLayer:
+    """
+    Walls never move, so they are drawn once into large chunk surfaces and
+    only the chunks inside the camera view are blitted each frame. A chunk is
+    baked again when a breakable wall inside it is destroyed.
+
+    On a streamed level chunks are only baked once they come into view, and
+    dropped again when the walls of a sector under them are streamed in or
+    out, so only the chunks around the player are ever held.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.walls = None
+        self.removed_seen = 0
+        self.streamed_seen = 0
+        self.chunks = {}  # (chunk_x, chunk_y) -> Surface, or None for a chunk without walls
+
+    def chunk_keys(self, rect):
+        # Every chunk the rect overlaps
+        size = self.chunk_size
+        for chunk_y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for chunk_x in range(rect.left // size, (rect.right - 1) // size + 1):
+                yield chunk_x, chunk_y
+
+    def bake(self, walls):
+        self.walls = walls
+        self.removed_seen = len(walls.removed_cells)
+        self.streamed_seen = len(walls.streamed)
+        self.chunks = {}
+        if walls.world:
+            return  # Baked as they come into view
+        keys = set()
+        for wall, _ in walls:
+            keys.update(self.chunk_keys(wall.rect))
+        for key in keys:
+            self.bake_chunk(key)
+
+    def bake_chunk(self, key):
+        size = self.chunk_size
+        area = pygame.Rect(key[0] * size, key[1] * size, size, size)
+        walls = self.walls.query_rect(area.x, area.y, area.width, area.height)
+        if not walls:
+            self.chunks[key] = None
+            return
+
+        chunk = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+        chunk.fill((0, 0, 0, 0))
+        for wall, _ in walls:
+            chunk.blit(wall.image, (wall.rect.x - area.x, wall.rect.y - area.y))
+        self.chunks[key] = chunk
+
+    def refresh(self, walls):
+        # Rebake after a level change, or just the chunks around destroyed walls
+        if walls is not self.walls:
+            self.bake(walls)
+            return
+
+        if len(walls.removed_cells) > self.removed_seen:
+            cell_size = walls.cell_size
+            dirty = set()
+            for cx, cy in walls.removed_cells[self.removed_seen:]:
+                dirty.update(self.chunk_keys(pygame.Rect(cx * cell_size, cy * cell_size, cell_size, cell_size)))
+            for key in dirty:
+                self.bake_chunk(key)
+            self.removed_seen = len(walls.removed_cells)
+
+        if len(walls.streamed) > self.streamed_seen:
+            for area in walls.streamed[self.streamed_seen:]:
+                for key in self.chunk_keys(pygame.Rect(area)):
+                    self.chunks.pop(key, None)
+            self.streamed_seen = len(walls.streamed)
+
+    def draw(self, screen, camera, walls):
+        self.refresh(walls)
+
+        # The part of the world the camera can see
+        view = pygame.Rect(-camera.camera.x, -camera.camera.y, screen.get_width(), screen.get_height())
+        for key in self.chunk_keys(view):
+            if key not in self.chunks:
+                self.bake_chunk(key)
+            chunk = self.chunks[key]
+            if chunk:
+                screen.blit(chunk, (key[0] * self.chunk_size + camera.camera.x, key[1] * self.chunk_size + camera.camera.y))
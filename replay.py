@@ -0,0 +1,200 @@
+"""
+Recorded play sessions, replayed tick for tick.
+
+    python main.py --record session.zsr     play normally, the session is saved on quit
+    python replay.py session.zsr            play it back headless as fast as it goes
+    python replay.py session.zsr --window   watch it, add --realtime for 60 FPS
+    python replay.py session.zsr --output bad.json
+    python replay.py session.zsr --compare bad.json
+
+A recording is the random seed, the screen size and the input of every
+tick, one byte each and compressed. Recorded and replayed games run on
+fixed 60 FPS game time from that seed, so the replay makes exactly the
+same moves; the state checksum saved at the end of the recording is
+checked against the replay's. Replays print per stage frame timings, so a
+session that ran badly can be kept and played again as a benchmark.
+"""
+import os
+import struct
+import zlib
+
+MAGIC = b"ZSRP"
+FORMAT_VERSION = 2  # Bump when the layout below, the input bits or what the state checksum covers change
+
+# magic, format version, seed, screen width and height, starting level, gameplay settings
+# checksum, tick count, state checksum at the end
+HEADER = struct.Struct("<4sHIHHHIII")
+
+# Input byte of a tick: the low three bits are the direction held, then one bit per action
+DIRECTIONS = ["None", "up", "down", "left", "right"]
+GUNS = [None, "handgun", "rifle", "shotgun"]
+SHOOT = 1 << 3
+RELOAD = 1 << 4
+GUN_SHIFT = 5  # Two bits for the gun switched to, 0 for none
+RESTART = 1 << 7
+
+
+def encode_input(direction="None", shoot=False, reload=False, gun=None, restart=False):
+    code = DIRECTIONS.index(direction if direction in DIRECTIONS else "None")
+    code |= GUNS.index(gun) << GUN_SHIFT
+    if shoot:
+        code |= SHOOT
+    if reload:
+        code |= RELOAD
+    if restart:
+        code |= RESTART
+    return code
+
+
+def decode_input(code):
+    # (direction, shoot, reload, gun, restart)
+    return (DIRECTIONS[code & 7], bool(code & SHOOT), bool(code & RELOAD),
+            GUNS[(code >> GUN_SHIFT) & 3], bool(code & RESTART))
+
+
+def settings_checksum():
+    # The settings that change how a game plays out, a replay with other values drifts apart
+    import settings
+    values = (settings.FPS, settings.MAX_LEVEL, settings.USE_FLOW_FIELD, settings.ZOMBIE_SEPARATION,
+              settings.ZOMBIE_VISION, settings.RIFLE_HITSCAN, settings.SEPARATION_RADIUS,
+              settings.SEPARATION_WEIGHT, settings.VISION_RANGE, settings.VISION_IDLE_INTERVAL,
+              settings.WORLD_STREAMING, settings.STREAMING_MIN_CELLS, settings.SECTOR_SIZE, settings.ACTIVE_SECTORS,
+              settings.DORMANT_INTERVAL, settings.STREAMED_PATH_RANGE)
+    return zlib.crc32(repr(values).encode())
+
+
+def state_checksum(level, player, zombies):
+    # Where everything stands, equal only when two games played out the same
+    from player import gun_info
+    ammo = [(gun, info["remaining_ammo"], info["ammo"]) for gun, info in gun_info.items()]
+    state = (level, player.x, player.y, player.health, ammo, [(zombie.x, zombie.y, zombie.health) for zombie in zombies])
+    return zlib.crc32(repr(state).encode())
+
+
+class Recording:
+    """
+    One play session: how it started and the input byte of every tick.
+    """
+
+    def __init__(self, seed, width, height, level=1, inputs=None, settings=0, checksum=0):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.level = level
+        self.inputs = bytearray(inputs or b"")
+        self.settings = settings
+        self.checksum = checksum
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def add(self, code):
+        self.inputs.append(code)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Not a recording, the file is too short")
+        magic, version, seed, width, height, level, settings, ticks, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a recording")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Recording format {version} is not supported, this build reads {FORMAT_VERSION}")
+        inputs = zlib.decompress(data[HEADER.size:])
+        if len(inputs) != ticks:
+            raise ValueError("Recording is cut short")
+        return cls(seed, width, height, level, inputs, settings, checksum)
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, self.seed, self.width, self.height, self.level,
+                             self.settings, len(self.inputs), self.checksum)
+        return header + zlib.compress(bytes(self.inputs), 9)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+    def save(self, path):
+        # Written next to the target first so a crash never leaves half a recording behind
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(temp_path, path)
+
+
+def replay_results(path, recording, timings, seconds, checksum):
+    from benchmark import summarize
+    stages = {}
+    for frame in timings:
+        for stage, elapsed in frame.items():
+            stages.setdefault(stage, []).append(elapsed)
+    return {
+        "replay": os.path.basename(path),
+        "ticks": len(recording),
+        "seconds": seconds,
+        "ticks_per_second": len(timings) / seconds if seconds > 0 else 0.0,
+        "matches_recording": checksum == recording.checksum,
+        "stages": {stage: summarize(values) for stage, values in stages.items()},
+    }
+
+
+def compare(results, baseline_path):
+    # Print stages whose p95 got slower than in the earlier replay, returns how many regressed
+    import json
+    from benchmark import REGRESSION_THRESHOLD, REGRESSION_MIN_MS
+    with open(baseline_path) as file:
+        baseline = json.load(file)["stages"]
+
+    regressions = 0
+    for stage, summary in results["stages"].items():
+        if stage not in baseline:
+            continue
+        before, after = baseline[stage]["p95"], summary["p95"]
+        if after > before * REGRESSION_THRESHOLD and after - before > REGRESSION_MIN_MS:
+            regressions += 1
+            print(f"REGRESSION {stage}: p95 {before:.3f}ms -> {after:.3f}ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Play back a recorded session and time every stage")
+    parser.add_argument("path", help="recording made with main.py --record")
+    parser.add_argument("--window", action="store_true", help="show the game while it replays")
+    parser.add_argument("--realtime", action="store_true", help="play at the game's frame rate instead of flat out")
+    parser.add_argument("--output", help="write the timings to this JSON file")
+    parser.add_argument("--compare", help="earlier --output file to check for regressions")
+    args = parser.parse_args()
+
+    recording = Recording.load(args.path)
+
+    # The screen size scales every size and speed in the game, so it has to match the recording
+    os.environ["ZOMBIE_SHOOTER_RESOLUTION"] = f"{recording.width}x{recording.height}"
+    if not args.window:
+        os.environ["ZOMBIE_SHOOTER_HEADLESS"] = "1"
+
+    import main as game
+    if recording.settings != settings_checksum():
+        print("Warning: the gameplay settings differ from when this was recorded, the replay will drift")
+
+    timings = []
+    start = time.perf_counter()
+    checksum = game.main(replay=recording, realtime=args.realtime, timings=timings)
+    results = replay_results(args.path, recording, timings, time.perf_counter() - start, checksum)
+
+    print(f"{results['replay']}: {len(timings)} of {results['ticks']} ticks in {results['seconds']:.2f}s "
+          f"({results['ticks_per_second']:.0f} ticks/s), "
+          f"{'matches the recording' if results['matches_recording'] else 'DIFFERS from the recording'}")
+    for stage, summary in results["stages"].items():
+        print(f"{stage:>12}: p50 {summary['p50']:6.2f}ms  p95 {summary['p95']:6.2f}ms  p99 {summary['p99']:6.2f}ms")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare and compare(results, args.compare):
+        sys.exit(1)
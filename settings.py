@@ -1,17 +1,30 @@
+import os
 import pygame
 import pathlib
 
 
-pygame.display.init()
-pygame.mixer.init()
+# Headless runs use SDL's dummy drivers so no display or sound card is needed
+HEADLESS = os.environ.get("ZOMBIE_SHOOTER_HEADLESS") == "1"
+if HEADLESS:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+pygame.display.init()  # Needed for the desktop size, the mixer is started when the first sound loads
 
 
 # Virtual Resolution (Logical Resolution for Game Logic)
 VIRTUAL_WIDTH = 800
 VIRTUAL_HEIGHT = 600
 
-# Get Actual Screen Resolution
-actual_screen_width, actual_screen_height = pygame.display.get_desktop_sizes()[0]
+# Get Actual Screen Resolution. Replays run at the size they were recorded at since every size
+# and speed is scaled by it, other headless runs use the virtual resolution
+RESOLUTION = os.environ.get("ZOMBIE_SHOOTER_RESOLUTION")
+if RESOLUTION:
+    actual_screen_width, actual_screen_height = (int(size) for size in RESOLUTION.split("x"))
+elif HEADLESS:
+    actual_screen_width, actual_screen_height = VIRTUAL_WIDTH, VIRTUAL_HEIGHT
+else:
+    actual_screen_width, actual_screen_height = pygame.display.get_desktop_sizes()[0]
 
 # Scaling Factors
 scale_x = actual_screen_width / VIRTUAL_WIDTH
@@ -23,6 +36,15 @@ COLLECT_ITEM_SIZE_SCALED = 20 * scale_x
 # General Settings
 FPS = 60
 MAX_LEVEL = 3  # Maximum number of levels in the game
+USE_HORDE_ENGINE = False  # Move zombies with the NumPy horde engine (needs numpy)
+USE_FLOW_FIELD = True  # Zombies path around walls using a flow field towards the player
+ZOMBIE_SEPARATION = True  # Zombies steer away from each other instead of piling up
+AI_WORKERS = 0  # Worker processes that share the zombie movement, 0 moves them all on the game's process
+ZOMBIE_VISION = True  # Zombies wait until they see the player or get shot, instead of always chasing
+LIGHTING_QUALITY = "high"  # "high" lights at screen resolution, "low" uses a smaller buffer that is scaled up
+LOW_QUALITY_LIGHT_SCALE = 0.5  # Size of the light buffer on "low" quality
+RIFLE_HITSCAN = False  # The rifle hits instantly along a ray instead of firing a bullet
+WORLD_STREAMING = True  # Big levels only keep the sectors around the player loaded, see world.World
 
 # Colors
 BLACK = (0, 0, 0)
@@ -37,8 +59,19 @@ collect_item_size = 20
 PLAYER_SIZE = int(35 * scale_x) 
 BULLET_SIZE = int(3 * scale_x)
 BULLET_SPEED = int(5 * scale_x)
+HITSCAN_RANGE = int(600 * scale_x)  # How far a hitscan shot reaches
 ZOMBIE_SIZE = int(35 * scale_x)
 ZOMBIE_SPEED = int(1 * scale_x)
+SEPARATION_RADIUS = ZOMBIE_SIZE  # Zombies closer than this push each other apart
+SEPARATION_WEIGHT = 1.0  # How hard that push steers compared to chasing the player
+VISION_RANGE = int(500 * scale_x)  # How far away a zombie can spot the player
+VISION_IDLE_INTERVAL = 10  # Idle zombies look for the player once every this many ticks
+STREAMING_MIN_CELLS = 128 * 128  # Levels with at least this many cells are streamed in sectors
+SECTOR_SIZE = 16  # Width and height of a streamed sector in cells
+ACTIVE_SECTORS = 1  # Sectors around the player's own in which zombies move at full detail
+SECTOR_BUDGET = 36  # Most sectors kept loaded at once, never fewer than the ones around the player
+DORMANT_INTERVAL = 10  # Zombies in the other sectors move once every this many ticks
+STREAMED_PATH_RANGE = 128  # Longest path in cells the flow field spreads on a streamed level
 torch_radius = int(180 * scale_x)
 
 PLAYER_SPEED = int(2*scale_x)
@@ -50,25 +83,20 @@ assets_dir = str(current_path) + "/assets"
 images_dir = assets_dir + "/images"
 sounds_dir = assets_dir + "/sound_effect"
 levels_dir = assets_dir + "/levels"
-
-
-# Asset Files
-bullet_image = pygame.image.load(images_dir + "/bullet.png")
-health_image = pygame.image.load(images_dir + "/health.png")
-akm_image = pygame.image.load(images_dir + "/AKM.png")
-rifle_ammo_image = pygame.image.load(images_dir + "/rifle_ammo.png")
-shotgun_image = pygame.image.load(images_dir + "/shotgun.png")
-shotgun_ammo_image = pygame.image.load(images_dir + "/shotgun_bullet.png")
-piston_ammo_image = pygame.image.load(images_dir + "/piston_bullet.png")
-bg_image = pygame.image.load(images_dir + "/bg_image.jpg")
-bg_image = pygame.transform.scale(bg_image, (actual_screen_width, actual_screen_height))
-wall_image = pygame.image.load(images_dir + "/wall3.PNG")
-breakable_wall_image = pygame.image.load(images_dir + "/break_wall.png")
-dead_zombie_image = pygame.image.load(images_dir + "/dead_zombie.png")
-
-# Sound Files
-gun_pickup_sound = pygame.mixer.Sound(sounds_dir + "/gun_pickup.mp3")
-item_pickup_sound = pygame.mixer.Sound(sounds_dir + "/collect_item.mp3")
-death_sound = pygame.mixer.Sound(sounds_dir + "/death.mp3")
-victory_sound = pygame.mixer.Sound(sounds_dir + "/victory_sound.mp3")
-loose_sound = pygame.mixer.Sound(sounds_dir + "/loose.mp3")
+level_cache_dir = levels_dir + "/compiled"
+
+
+# Asset Files, loaded on first use through assets.assets by these names
+IMAGE_FILES = {
+    "bullet": "bullet.png",
+    "health": "health.png",
+    "akm": "AKM.png",
+    "rifle_ammo": "rifle_ammo.png",
+    "shotgun": "shotgun.png",
+    "shotgun_ammo": "shotgun_bullet.png",
+    "piston_ammo": "piston_bullet.png",
+    "background": "bg_image.jpg",
+    "wall": "wall3.PNG",
+    "breakable_wall": "break_wall.png",
+    "dead_zombie": "dead_zombie.png",
+}
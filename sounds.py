@@ -0,0 +1,106 @@
+import os
+import threading
+import pygame
+from settings import sounds_dir
+
+
+# How many of each kind of sound can play at the same time
+VOICE_LIMITS = {
+    "gun": 4,
+    "zombie": 4,
+    "damage": 2,
+    "pickup": 2,
+    "player": 2,
+}
+
+SOUND_EXTENSIONS = (".mp3", ".ogg", ".wav")
+
+
+class SoundBank:
+    """
+    Decodes each clip in the sound effect folder once and plays them on a
+    fixed pool of mixer channels per category. When a category is at its
+    voice limit the oldest sound in it is cut off, so a shotgun volley or a
+    pile of zombie deaths never queues up more voices than the limit.
+
+    Clips are named by their path inside the folder without the extension,
+    for example "gun_sound/rifle" or "damage_sound/3". Each one is decoded
+    the first time it is used, or all at once with warm().
+    """
+
+    def __init__(self, directory=sounds_dir, voice_limits=VOICE_LIMITS):
+        self.directory = directory
+        self.voice_limits = voice_limits
+        self.files = {}  # Clip name -> file path
+        self.sounds = {}  # Clip name -> decoded Sound, filled in as clips are used
+        self.lock = threading.Lock()
+        self.pools = {}
+        self.started = {}  # Channel -> tick it started playing, to find the oldest voice
+        self.loaded = False
+
+    def load(self):
+        # Find the clips and set up the channel pools, nothing is decoded yet
+        if self.loaded:
+            return
+        with self.lock:
+            if self.loaded:
+                return
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            for root, _, files in os.walk(self.directory):
+                for file in sorted(files):
+                    name, extension = os.path.splitext(file)
+                    if extension.lower() not in SOUND_EXTENSIONS:
+                        continue
+                    relative = os.path.relpath(os.path.join(root, name), self.directory)
+                    self.files[relative.replace(os.sep, "/")] = os.path.join(root, file)
+
+            # Reserve the first channels for the pools so free Sound.play calls never take them
+            needed = sum(self.voice_limits.values())
+            if pygame.mixer.get_num_channels() < needed + 8:
+                pygame.mixer.set_num_channels(needed + 8)
+            pygame.mixer.set_reserved(needed)
+
+            channel_id = 0
+            for category, limit in self.voice_limits.items():
+                self.pools[category] = [pygame.mixer.Channel(channel_id + i) for i in range(limit)]
+                channel_id += limit
+            self.loaded = True
+
+    def get(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            self.load()
+            with self.lock:
+                sound = self.sounds.get(name)
+                if sound is None:
+                    sound = self.sounds[name] = pygame.mixer.Sound(self.files[name])
+        return sound
+
+    def warm(self):
+        # Decode every clip now instead of on first use
+        self.load()
+        for name in self.files:
+            self.get(name)
+
+    def play(self, name, category="player", loops=0):
+        """
+        Play a clip on a free channel of its category, stealing the oldest
+        one when they are all busy. Returns the channel used.
+        """
+        self.load()
+        pool = self.pools[category]
+        channel = None
+        for candidate in pool:
+            if not candidate.get_busy():
+                channel = candidate
+                break
+        if channel is None:
+            channel = min(pool, key=lambda c: self.started.get(c, 0))
+
+        channel.play(self.get(name), loops=loops)
+        self.started[channel] = pygame.time.get_ticks()
+        return channel
+
+
+sound_bank = SoundBank()
@@ -0,0 +1,258 @@
+class WallGrid:
+    """
+    Stores the level walls in a uniform grid keyed by map cell so collision
+    checks only look at the few cells an object overlaps instead of every wall.
+
+    It still behaves like the old list of (Wall, type) tuples: it can be
+    iterated, counted and have walls removed from it.
+    """
+
+    def __init__(self, cell_size, cols=0, rows=0):
+        self.cell_size = cell_size
+        self.cols = cols
+        self.rows = rows
+        self.walls = []  # Keeps the insertion order for drawing
+        self.cells = {}  # (cell_x, cell_y) -> list of (Wall, type)
+        self.version = 0  # Bumped whenever a wall is added or removed
+        self.removed_cells = []  # Cells freed by destroyed walls, in order
+        self.world = None  # The world.World streaming this grid's walls in and out, if any
+        self.streamed = []  # (x, y, width, height) areas whose walls were streamed in or out, in order
+
+    def __iter__(self):
+        return iter(self.walls)
+
+    def __len__(self):
+        return len(self.walls)
+
+    def __contains__(self, item):
+        return item in self.walls
+
+    def cell_of(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _cells_for(self, x, y, width, height):
+        # Every cell touched by the box, edges included
+        x1, y1 = self.cell_of(x, y)
+        x2, y2 = self.cell_of(x + width, y + height)
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                yield cx, cy
+
+    def _wall_cells(self, wall):
+        # Walls are exactly one cell big, so they live in the cell under their centre
+        yield self.cell_of(wall.x + self.cell_size / 2, wall.y + self.cell_size / 2)
+
+    def append(self, item):
+        wall = item[0]
+        self.walls.append(item)
+        self.version += 1
+        for key in self._wall_cells(wall):
+            self.cells.setdefault(key, []).append(item)
+
+    def remove(self, item):
+        wall = item[0]
+        self.walls.remove(item)
+        self.version += 1
+        for key in self._wall_cells(wall):
+            bucket = self.cells.get(key)
+            if bucket and item in bucket:
+                bucket.remove(item)
+                if not bucket:
+                    del self.cells[key]
+                    self.removed_cells.append(key)
+
+    def is_open(self, cx, cy):
+        # True for cells inside the level that hold no wall
+        return 0 <= cx < self.cols and 0 <= cy < self.rows and (cx, cy) not in self.cells
+
+    def query_rect(self, x, y, width, height):
+        # All walls overlapping the box (x, y, width, height)
+        found = []
+        for key in self._cells_for(x, y, width, height):
+            for item in self.cells.get(key, ()):
+                wall = item[0]
+                if (x + width > wall.x and x < wall.x + self.cell_size and
+                    y + height > wall.y and y < wall.y + self.cell_size and
+                    item not in found):
+                    found.append(item)
+        return found
+
+    def collides(self, x, y, width, height):
+        # Same overlap test the player and zombies used to run against every wall
+        for key in self._cells_for(x, y, width, height):
+            for wall, _ in self.cells.get(key, ()):
+                if (x + width > wall.x and x < wall.x + self.cell_size and
+                    y + height > wall.y and y < wall.y + self.cell_size):
+                    return True
+        return False
+
+    def wall_at(self, x, y):
+        # The wall containing the point, or None
+        for item in self.cells.get(self.cell_of(x, y), ()):
+            wall = item[0]
+            if (x > wall.x and x < wall.x + self.cell_size and
+                y > wall.y and y < wall.y + self.cell_size):
+                return item
+        return None
+
+
+def traverse_grid(x0, y0, x1, y1, cell_size):
+    """
+    Walk the grid cells a segment passes through, in order, using the
+    Amanatides & Woo voxel traversal. Yields (cell_x, cell_y, t_exit) where
+    t_exit is how far along the segment (0 to 1) it leaves that cell.
+    """
+    cell_x, cell_y = int(x0 // cell_size), int(y0 // cell_size)
+    dx, dy = x1 - x0, y1 - y0
+
+    if dx > 0:
+        step_x, t_max_x, t_delta_x = 1, ((cell_x + 1) * cell_size - x0) / dx, cell_size / dx
+    elif dx < 0:
+        step_x, t_max_x, t_delta_x = -1, (cell_x * cell_size - x0) / dx, -cell_size / dx
+    else:
+        step_x, t_max_x, t_delta_x = 0, float("inf"), float("inf")
+
+    if dy > 0:
+        step_y, t_max_y, t_delta_y = 1, ((cell_y + 1) * cell_size - y0) / dy, cell_size / dy
+    elif dy < 0:
+        step_y, t_max_y, t_delta_y = -1, (cell_y * cell_size - y0) / dy, -cell_size / dy
+    else:
+        step_y, t_max_y, t_delta_y = 0, float("inf"), float("inf")
+
+    while True:
+        t_exit = min(t_max_x, t_max_y, 1.0)
+        yield cell_x, cell_y, t_exit
+        if t_exit >= 1.0:
+            return
+        if t_max_x < t_max_y:
+            cell_x += step_x
+            t_max_x += t_delta_x
+        else:
+            cell_y += step_y
+            t_max_y += t_delta_y
+
+
+def segment_hits_box(x0, y0, dx, dy, left, top, right, bottom):
+    """
+    Where the segment from (x0, y0) along (dx, dy) first enters the open box,
+    as a fraction from 0 to 1, or None when it misses. Starting inside the box
+    counts as a hit at 0.
+    """
+    t_enter, t_exit = 0.0, 1.0
+    for start, delta, low, high in ((x0, dx, left, right), (y0, dy, top, bottom)):
+        if delta == 0:
+            if not low < start < high:
+                return None
+            continue
+        t1 = (low - start) / delta
+        t2 = (high - start) / delta
+        if t1 > t2:
+            t1, t2 = t2, t1
+        t_enter = max(t_enter, t1)
+        t_exit = min(t_exit, t2)
+        if t_enter >= t_exit:
+            return None
+    return t_enter
+
+
+class EntityGrid:
+    """
+    Spatial hash for things that move or get removed during a tick, like
+    zombies and pickups. Each entity is filed under the cell of its top left
+    corner, so keeping up with a moving entity is one cell lookup, and queries
+    also look far enough up and left to catch the largest entity stored.
+
+    Entities can be removed at any point in a tick, queries never see them
+    again and lists being iterated elsewhere are left alone.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> list of entities with their corner in that cell
+        self.entries = {}  # id(entity) -> [entity, order, x, y, width, height, cell]
+        self.order = 0  # Insertion counter, queries return entities in insertion order
+        self.reach = 0  # How many cells the largest entity spans past its own
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, entity):
+        return id(entity) in self.entries
+
+    def clear(self):
+        self.cells = {}
+        self.entries = {}
+        self.order = 0
+        self.reach = 0
+
+    def insert(self, entity, x, y, width, height):
+        size = self.cell_size
+        cell = (int(x // size), int(y // size))
+        self.entries[id(entity)] = [entity, self.order, x, y, width, height, cell]
+        self.order += 1
+        self.reach = max(self.reach, int(max(width, height) // size) + 1)
+        self.cells.setdefault(cell, []).append(entity)
+
+    def rebuild(self, entities, width, height):
+        # Index entities that all have the same size and their own x and y
+        self.clear()
+        for entity in entities:
+            self.insert(entity, entity.x, entity.y, width, height)
+
+    def _refile(self, entity, entry, cell):
+        bucket = self.cells[entry[6]]
+        bucket.remove(entity)
+        if not bucket:
+            del self.cells[entry[6]]
+        self.cells.setdefault(cell, []).append(entity)
+        entry[6] = cell
+
+    def move(self, entity, x, y):
+        entry = self.entries[id(entity)]
+        entry[2], entry[3] = x, y
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        if cell != entry[6]:
+            self._refile(entity, entry, cell)
+
+    def move_all(self, entities):
+        # move() for a whole list of entities at their own x and y, inlined as it runs every tick
+        size = self.cell_size
+        entries = self.entries
+        for entity in entities:
+            entry = entries[id(entity)]
+            x = entry[2] = entity.x
+            y = entry[3] = entity.y
+            cell = (int(x // size), int(y // size))
+            if cell != entry[6]:
+                self._refile(entity, entry, cell)
+
+    def remove(self, entity):
+        entry = self.entries.pop(id(entity), None)
+        if entry:
+            bucket = self.cells[entry[6]]
+            bucket.remove(entity)
+            if not bucket:
+                del self.cells[entry[6]]
+
+    def order_of(self, entity):
+        return self.entries[id(entity)][1]
+
+    def near_cell(self, cell_x, cell_y):
+        # Every entity that could overlap the cell, some may be returned more than once
+        reach = self.reach
+        for key_y in range(cell_y - reach, cell_y + 1):
+            for key_x in range(cell_x - reach, cell_x + 1):
+                yield from self.cells.get((key_x, key_y), ())
+
+    def query(self, x, y, width, height):
+        # Entities whose box overlaps (x, y, width, height), edges not included, oldest first
+        size = self.cell_size
+        found = {}
+        for key_y in range(int(y // size) - self.reach, int((y + height) // size) + 1):
+            for key_x in range(int(x // size) - self.reach, int((x + width) // size) + 1):
+                for entity in self.cells.get((key_x, key_y), ()):
+                    entry = self.entries[id(entity)]
+                    if (x < entry[2] + entry[4] and x + width > entry[2] and
+                        y < entry[3] + entry[5] and y + height > entry[3]):
+                        found[entry[1]] = entity
+        return [found[order] for order in sorted(found)]
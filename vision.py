@@ -0,0 +1,77 @@
+import math
+from spatial import traverse_grid
+from settings import VISION_RANGE, VISION_IDLE_INTERVAL, ZOMBIE_SIZE, PLAYER_SIZE
+
+
+class Vision:
+    """
+    Decides which zombies have spotted the player. A zombie stands still
+    until it sees the player or gets shot, then it chases for good.
+
+    Sight is worked out between map cells: a ray from the centre of the
+    zombie's cell to the centre of the player's cell, walked through the
+    wall grid, is blocked by any wall cell on the way. All the zombies
+    checked in a tick are done together and share one ray per cell, and
+    the answers are kept until the player moves to another cell or a wall
+    is broken, so a still player costs nothing after the first look.
+
+    Idle zombies only look around every idle_interval ticks, a different
+    slice of the horde each tick, which keeps the cost flat however many
+    zombies are waiting.
+    """
+
+    def __init__(self, sight_range=VISION_RANGE, idle_interval=VISION_IDLE_INTERVAL):
+        self.sight_range = sight_range
+        self.idle_interval = max(1, idle_interval)
+        self.cache = {}  # Zombie cell -> can the player's cell be seen from it
+        self.walls = None
+        self.walls_version = -1
+        self.player_cell = None
+        self.tick = 0
+        self.rays = 0  # Rays cast so far, the cache hits are everything else
+
+    def can_see(self, walls, from_cell, to_cell):
+        # Line of sight between the centres of two cells, ignoring zombies
+        cell_size = walls.cell_size
+        x0 = (from_cell[0] + 0.5) * cell_size
+        y0 = (from_cell[1] + 0.5) * cell_size
+        x1 = (to_cell[0] + 0.5) * cell_size
+        y1 = (to_cell[1] + 0.5) * cell_size
+        if math.hypot(x1 - x0, y1 - y0) > self.sight_range:
+            return False
+
+        self.rays += 1
+        cells = walls.cells
+        for cell_x, cell_y, _ in traverse_grid(x0, y0, x1, y1, cell_size):
+            if (cell_x, cell_y) in cells:
+                return False
+        return True
+
+    def update(self, player, walls, zombies):
+        """
+        Look for the player with the idle zombies due this tick and alert the
+        ones that see it.
+        """
+        player_cell = walls.cell_of(player.x + PLAYER_SIZE / 2, player.y + PLAYER_SIZE / 2)
+        if walls is not self.walls or player_cell != self.player_cell:
+            self.cache = {}
+        elif walls.version != self.walls_version:
+            # A broken wall can only open up new sight lines, the ones already clear stay clear
+            self.cache = {cell: seen for cell, seen in self.cache.items() if seen}
+        self.walls = walls
+        self.walls_version = walls.version
+        self.player_cell = player_cell
+
+        cache = self.cache
+        half = ZOMBIE_SIZE / 2
+        start = -self.tick % self.idle_interval
+        for zombie in zombies[start::self.idle_interval]:
+            if zombie.alerted:
+                continue
+            cell = walls.cell_of(zombie.x + half, zombie.y + half)
+            seen = cache.get(cell)
+            if seen is None:
+                seen = cache[cell] = self.can_see(walls, cell, player_cell)
+            if seen:
+                zombie.alerted = True
+        self.tick += 1
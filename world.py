@@ -0,0 +1,350 @@
+import math
+import random
+from array import array
+
+from spatial import WallGrid
+from zombie import Zombie
+from levels import WALL_TILES
+from settings import (CELL_SIZE_SCALED, PLAYER_SIZE, ZOMBIE_SIZE, ZOMBIE_SPEED, ZOMBIE_VISION, SECTOR_SIZE,
+                      ACTIVE_SECTORS, SECTOR_BUDGET, DORMANT_INTERVAL, STREAMED_PATH_RANGE)
+
+ZOMBIE_TILE = 4
+PLAYER_TILE = 5
+WALL_HEALTH = 100  # What every wall starts with, only walls below it are remembered while unloaded
+FIELDS = 4  # Doubles stored per dormant zombie: x, y, health, alerted
+SOLID = bytes.maketrans(b"\0\1", b"\1\0")  # Turns passable bytes into solid ones
+
+
+def cell_lists(walls, zombies, pickups, guns, dead_body, blood):
+    # The list the entity of each level cell code goes in, the player start has none
+    return {1: walls, 2: pickups["ammo"], 3: pickups["health"], 4: zombies, 6: walls, 7: guns, 8: guns,
+            9: pickups["ammo"], 10: pickups["ammo"], 11: dead_body, 12: blood}
+
+
+def zombies_left(walls, zombies):
+    # Zombies still alive on the level, counting the dormant ones of a streamed level
+    return len(zombies) + (walls.world.dormant_count if walls.world else 0)
+
+
+class SectorWalls(WallGrid):
+    """
+    The wall grid of a streamed level. Only walls in loaded sectors are in
+    it, but is_open answers for every cell from the world's solid bytes, so
+    flow fields still find their way across the whole level.
+    """
+
+    def __init__(self, world, cell_size, cols, rows):
+        super().__init__(cell_size, cols, rows)
+        self.world = world
+
+    def is_open(self, cx, cy):
+        return 0 <= cx < self.cols and 0 <= cy < self.rows and not self.world.solid[cy * self.cols + cx]
+
+    def remove(self, item):
+        # A destroyed wall, unlike the walls of a sector being unloaded it is gone for good
+        super().remove(item)
+        self.world.wall_destroyed(item[0])
+
+    def stream_in(self, items, area):
+        for item in items:
+            self.walls.append(item)
+            for key in self._wall_cells(item[0]):
+                self.cells.setdefault(key, []).append(item)
+        self.version += 1
+        self.streamed.append(area)
+
+    def stream_out(self, items, area):
+        # Unlike remove this leaves removed_cells alone, the cells are still solid
+        leaving = {id(item) for item in items}
+        self.walls = [item for item in self.walls if id(item) not in leaving]
+        for item in items:
+            for key in self._wall_cells(item[0]):
+                bucket = self.cells.get(key)
+                if bucket and item in bucket:
+                    bucket.remove(item)
+                    if not bucket:
+                        del self.cells[key]
+        self.version += 1
+        self.streamed.append(area)
+
+
+class World:
+    """
+    A big level split into square sectors of sector_size cells, so only the
+    part around the player is ever built. Zombies in the active sectors, the
+    player's own and active_radius rings around it, are Zombie objects that
+    play exactly like on any other level. One more ring is loaded too: its
+    walls, pickups and decorations exist, so nothing next to the action is
+    missing, and zombies walking out of the active sectors still bump into
+    walls until they are put to sleep.
+
+    Everything else is kept compact: a byte per cell for what it holds and
+    one for whether it is solid, and four numbers per dormant zombie.
+    Dormant zombies that chase the player move at reduced detail, a slice
+    of the sectors every tick, dormant_interval steps at a time along the
+    flow field without collisions or separation. They wake up once they
+    walk into an active sector. The flow field only spreads path_range cells
+    on a streamed level, so its cost doesn't grow with the level either.
+
+    Sectors the player moved away from stay loaded until more than budget
+    are, then the ones needed longest ago are unloaded, writing back which
+    pickups were taken and which walls were damaged or destroyed.
+    """
+
+    def __init__(self, level, spawn, rng=random, sector_size=SECTOR_SIZE, budget=SECTOR_BUDGET,
+                 active_radius=ACTIVE_SECTORS, dormant_interval=DORMANT_INTERVAL, path_range=STREAMED_PATH_RANGE):
+        # spawn(code, x, y, rng) builds the entity of a level cell, like main.spawn_cell
+        self.spawn = spawn
+        self.cols = level.cols
+        self.rows = level.rows
+        self.cell_size = CELL_SIZE_SCALED
+        self.sector_size = sector_size
+        self.sector_cols = -(-level.cols // sector_size)
+        self.budget = budget
+        self.active_radius = active_radius
+        self.dormant_interval = max(1, dormant_interval)
+        self.path_range = path_range
+        # Decorations are rolled from this per sector, so a sector looks the same every time it loads
+        self.seed = rng.randrange(2 ** 32)
+
+        # The whole level in compact form
+        self.tiles = bytearray(level.tiles)  # What every cell holds, kept up to date as sectors unload
+        self.solid = bytearray(level.passable.translate(SOLID))  # 1 where a wall stands
+        self.wall_health = {}  # Cell index -> health of walls damaged before their sector unloaded
+        self.dormant = {}  # Sector -> array of FIELDS doubles per dormant zombie
+        self.dormant_count = 0
+
+        self.walls = SectorWalls(self, self.cell_size, level.cols, level.rows)
+        self.zombies = []
+        self.pickups = {"ammo": [], "health": []}
+        self.guns = []
+        self.dead_body = []
+        self.blood = []
+        self.lists = cell_lists(self.walls, self.zombies, self.pickups, self.guns, self.dead_body, self.blood)
+
+        self.loaded = {}  # Sector -> [(cell index, code, entity)], the one needed longest ago first
+        self.centre = None
+        self.active = []  # Active sectors in row order
+        self.active_set = set()
+        self.tick = 0
+
+        # Every zombie starts dormant and the ones near the player wake up right away
+        self.player_start = None
+        for index in level.cells:
+            y, x = divmod(index, self.cols)
+            if self.tiles[index] == ZOMBIE_TILE:
+                self.tiles[index] = 0
+                self.add_dormant(x * self.cell_size, y * self.cell_size, 100, 0)  # Full health, not alerted
+            elif self.tiles[index] == PLAYER_TILE:
+                self.player_start = (x * self.cell_size, y * self.cell_size)
+        if self.player_start:
+            self.stream(self.sector_of(self.player_start[0] + PLAYER_SIZE / 2, self.player_start[1] + PLAYER_SIZE / 2))
+            self.settle()
+
+    def level_map(self):
+        # The same tuple create_map returns, the lists are kept up to date in place
+        return self.walls, self.player_start, self.zombies, self.pickups, self.guns, self.dead_body, self.blood
+
+    def sector_of(self, x, y):
+        cell_x, cell_y = self.walls.cell_of(x, y)
+        return cell_x // self.sector_size, cell_y // self.sector_size
+
+    def is_loaded(self, x, y):
+        # Whether the point is in a loaded sector, walls anywhere else are only in the solid bytes
+        return self.sector_of(x, y) in self.loaded
+
+    def sector_area(self, key):
+        size = self.sector_size * self.cell_size
+        return key[0] * size, key[1] * size, size, size
+
+    def sectors_around(self, centre, radius):
+        # Sectors within radius of centre that are inside the level, in row order
+        sector_rows = -(-self.rows // self.sector_size)
+        return [(sx, sy)
+                for sy in range(max(0, centre[1] - radius), min(sector_rows, centre[1] + radius + 1))
+                for sx in range(max(0, centre[0] - radius), min(self.sector_cols, centre[0] + radius + 1))]
+
+    def update(self, player, flow_field=None):
+        """
+        Stream sectors in and out around the player, move the dormant
+        zombies and swap zombies between dormant and active. Returns True
+        when any list changed, so indexes built over them can be redone.
+        """
+        changed = False
+        centre = self.sector_of(player.x + PLAYER_SIZE / 2, player.y + PLAYER_SIZE / 2)
+        if centre != self.centre:
+            self.stream(centre)
+            changed = True
+
+        self.move_dormant(player, flow_field)
+        if changed or self.tick % self.dormant_interval == 0:
+            changed = self.settle() or changed
+        self.tick += 1
+        return changed
+
+    def stream(self, centre):
+        # Load the sectors around centre, then unload the ones needed longest ago over budget
+        self.centre = centre
+        self.active = self.sectors_around(centre, self.active_radius)
+        self.active_set = set(self.active)
+        needed = self.sectors_around(centre, self.active_radius + 1)
+        for key in needed:
+            if key in self.loaded:
+                self.loaded[key] = self.loaded.pop(key)
+            else:
+                self.load(key)
+        while len(self.loaded) > max(self.budget, len(needed)):
+            self.unload(next(iter(self.loaded)))
+
+    def load(self, key):
+        rng = random.Random(f"{self.seed}:{key[0]}:{key[1]}")
+        size = self.sector_size
+        entities = []
+        walls = []
+        for cy in range(key[1] * size, min((key[1] + 1) * size, self.rows)):
+            for cx in range(key[0] * size, min((key[0] + 1) * size, self.cols)):
+                index = cy * self.cols + cx
+                code = self.tiles[index]
+                target = self.lists.get(code)
+                if target is None:
+                    continue
+                entity = self.spawn(code, cx * self.cell_size, cy * self.cell_size, rng)
+                if code in WALL_TILES:
+                    entity[0].health = self.wall_health.pop(index, entity[0].health)
+                    walls.append(entity)
+                else:
+                    target.append(entity)
+                entities.append((index, code, entity))
+        self.walls.stream_in(walls, self.sector_area(key))
+        self.loaded[key] = entities
+
+    def unload(self, key):
+        walls = []
+        alive = {}  # id(list) -> ids of the entities still in it
+        leaving = {}  # id(list) -> (list, ids of its entities to drop)
+        for index, code, entity in self.loaded.pop(key):
+            if code in WALL_TILES:
+                if self.tiles[index]:  # Destroyed walls already cleared their cell
+                    walls.append(entity)
+                    if entity[0].health < WALL_HEALTH:
+                        self.wall_health[index] = entity[0].health
+                continue
+            target = self.lists[code]
+            if id(target) not in alive:
+                alive[id(target)] = {id(item) for item in target}
+            if id(entity) in alive[id(target)]:
+                leaving.setdefault(id(target), (target, set()))[1].add(id(entity))
+            else:
+                self.tiles[index] = 0  # Picked up
+        for target, ids in leaving.values():
+            target[:] = [item for item in target if id(item) not in ids]
+        self.walls.stream_out(walls, self.sector_area(key))
+
+    def wall_destroyed(self, wall):
+        cell_x, cell_y = self.walls.cell_of(wall.x + self.cell_size / 2, wall.y + self.cell_size / 2)
+        index = cell_y * self.cols + cell_x
+        self.tiles[index] = 0
+        self.solid[index] = 0
+        self.wall_health.pop(index, None)
+
+    def add_dormant(self, x, y, health, alerted):
+        key = self.sector_of(x + ZOMBIE_SIZE / 2, y + ZOMBIE_SIZE / 2)
+        self.dormant.setdefault(key, array("d")).extend((x, y, health, alerted))
+        self.dormant_count += 1
+
+    def settle(self):
+        # Put zombies outside the active sectors to sleep and wake the dormant ones inside, True if any moved
+        half = ZOMBIE_SIZE / 2
+        active = self.active_set
+        sleeping = [zombie for zombie in self.zombies if self.sector_of(zombie.x + half, zombie.y + half) not in active]
+        if sleeping:
+            ids = {id(zombie) for zombie in sleeping}
+            self.zombies[:] = [zombie for zombie in self.zombies if id(zombie) not in ids]
+            for zombie in sleeping:
+                self.add_dormant(zombie.x, zombie.y, zombie.health, zombie.alerted)
+
+        woken = False
+        for key in self.active:
+            records = self.dormant.pop(key, None)
+            if not records:
+                continue
+            for i in range(0, len(records), FIELDS):
+                zombie = Zombie(records[i], records[i + 1])
+                zombie.health = records[i + 2]
+                zombie.alerted = bool(records[i + 3])
+                self.zombies.append(zombie)
+            self.dormant_count -= len(records) // FIELDS
+            woken = True
+        return bool(sleeping) or woken
+
+    def move_dormant(self, player, flow_field=None):
+        # Every tick one slice of the sectors moves its chasing zombies dormant_interval steps at once
+        interval = self.dormant_interval
+        phase = self.tick % interval
+        reach = ZOMBIE_SPEED * interval
+        flow = flow_field if flow_field and flow_field.walls is self.walls else None
+        half = ZOMBIE_SIZE / 2
+        moved = []
+        for key in [key for key in self.dormant if (key[1] * self.sector_cols + key[0]) % interval == phase]:
+            records = self.dormant[key]
+            leaving = []
+            for i in range(0, len(records), FIELDS):
+                if ZOMBIE_VISION and not records[i + 3]:
+                    continue  # Idle, waiting for the player to come by
+                x, y = self.dormant_step(records[i], records[i + 1], player, flow, reach)
+                records[i], records[i + 1] = x, y
+                if self.sector_of(x + half, y + half) != key:
+                    leaving.append(i)
+            if leaving:
+                moved.extend(records[i:i + FIELDS] for i in leaving)
+                for i in reversed(leaving):
+                    del records[i:i + FIELDS]
+                if not records:
+                    del self.dormant[key]
+
+        # Filed under their new sectors once every slice moved, so nobody takes two turns in one tick
+        for x, y, health, alerted in moved:
+            self.dormant_count -= 1
+            self.add_dormant(x, y, health, alerted)
+
+    def dormant_step(self, x, y, player, flow=None, reach=ZOMBIE_SPEED):
+        # Cell centre to cell centre along the flow field, or straight at the player without one
+        half = ZOMBIE_SIZE / 2
+        for _ in range(3):
+            if flow:
+                target = flow.waypoint(x, y)
+                if target and target[0] != x and target[1] != y:
+                    # The path turns, get back in line with the middle of this cell first so no corner is cut
+                    cell_x, cell_y = self.walls.cell_of(x + half, y + half)
+                    target = (cell_x + 0.5) * self.cell_size - half, (cell_y + 0.5) * self.cell_size - half
+            else:
+                target = (player.x, player.y)
+            if target is None:
+                break
+            dx, dy = target[0] - x, target[1] - y
+            distance = math.hypot(dx, dy)
+            if distance == 0:
+                break
+            if distance > reach:
+                target = (x + dx / distance * reach, y + dy / distance * reach)
+            if not flow and self.blocked(*target):
+                break
+            x, y = target
+            reach -= min(distance, reach)
+            if reach <= 0:
+                break
+        return x, y
+
+    def blocked(self, x, y):
+        # Whether a zombie at (x, y) overlaps a wall, the same strict test as WallGrid.collides but on the solid bytes
+        cell_size = self.cell_size
+        x1, y1 = self.walls.cell_of(x, y)
+        x2, y2 = self.walls.cell_of(x + ZOMBIE_SIZE, y + ZOMBIE_SIZE)
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                if not (x + ZOMBIE_SIZE > cx * cell_size and x < (cx + 1) * cell_size and
+                        y + ZOMBIE_SIZE > cy * cell_size and y < (cy + 1) * cell_size):
+                    continue
+                if not self.walls.is_open(cx, cy):
+                    return True
+        return False
@@ -1,131 +1,128 @@
 import pygame
+import gametime
 import pathlib
 import math
-from settings import CELL_SIZE_SCALED, ZOMBIE_SIZE, ZOMBIE_SPEED
+from settings import ZOMBIE_SIZE, ZOMBIE_SPEED
 
 
 ANIMATION_COOLDOWN = 100 
 
 current_path = pathlib.Path().absolute()
 
+# Zombie frames are shared by every zombie, loaded the first time one is created
+zombie_frames = {}
+
+
+def load_zombie_frames():
+    """
+    Load the zombie animation once and keep a rotated copy of every frame for
+    each direction, so zombies only hand out references to these surfaces.
+    """
+    if not zombie_frames:
+        animation_list = []
+        for i in range(6):
+            image = pygame.image.load(f'{current_path}/assets/images/zombie/{i+1}.png').convert_alpha()
+            # Scale the image
+            image = pygame.transform.scale(image, (ZOMBIE_SIZE, ZOMBIE_SIZE))
+            animation_list.append(image)
+
+        zombie_frames["up"] = animation_list  # No rotation for up
+        zombie_frames["right"] = [pygame.transform.rotate(image, 270) for image in animation_list]
+        zombie_frames["left"] = [pygame.transform.rotate(image, 90) for image in animation_list]
+        zombie_frames["down"] = [pygame.transform.rotate(image, 180) for image in animation_list]
+    return zombie_frames
+
+
+def chase_step(x, y, direction, player_x, player_y, walls, flow_field=None, push=None):
+    """
+    One step of a zombie at (x, y) towards the player, as (x, y, direction).
+    None means it is already standing on its target. This only reads the walls
+    and the flow field, so the parallel AI workers run exactly the same step.
+    """
+    target_x, target_y = player_x, player_y
+
+    # Follow the flow field around walls until the zombie reaches the player's cell
+    if flow_field:
+        waypoint = flow_field.waypoint(x, y)
+        if waypoint:
+            target_x, target_y = waypoint
+
+    dx = target_x - x
+    dy = target_y - y
+    distance = math.sqrt(dx**2 + dy**2)
+    if distance <= 0:
+        return None
+
+    dx = dx / distance * ZOMBIE_SPEED
+    dy = dy / distance * ZOMBIE_SPEED
+
+    # Steer away from crowding zombies, still at walking speed
+    if push and (push[0] or push[1]):
+        dx += push[0] * ZOMBIE_SPEED
+        dy += push[1] * ZOMBIE_SPEED
+        length = math.sqrt(dx * dx + dy * dy)
+        if length > 0:
+            dx = dx / length * ZOMBIE_SPEED
+            dy = dy / length * ZOMBIE_SPEED
+
+    # Try direct movement first
+    new_x = x + dx
+    new_y = y + dy
+
+    # Check collision with walls
+    direct_path_blocked = walls.collides(new_x, new_y, ZOMBIE_SIZE, ZOMBIE_SIZE)
+
+    # Here is the explanation of the code below first zombie try to move directly towards the player if there is no wall in between them
+    # if there is a wall in between them then zombie will try to move horizontally or vertically towards the player
+    # if both horizontal and vertical movements are blocked then zombie will not move
+
+    if direct_path_blocked:
+        # Try horizontal movement only
+        if not walls.collides(x + dx, y, ZOMBIE_SIZE, ZOMBIE_SIZE):
+            # Move horizontally, facing the way it went
+            return x + dx, y, "right" if dx > 0 else "left"
+
+        # Try vertical movement only
+        if not walls.collides(x, y + dy, ZOMBIE_SIZE, ZOMBIE_SIZE):
+            # Move vertically, facing the way it went
+            return x, y + dy, "down" if dy > 0 else "up"
+
+        # If both horizontal and vertical movements are blocked, do nothing
+        return x, y, direction
+
+    # Move directly towards the player, facing the bigger part of the movement
+    if abs(dx) > abs(dy):  # Horizontal movement
+        return new_x, new_y, "right" if dx > 0 else "left"
+    # Vertical movement
+    return new_x, new_y, "down" if dy > 0 else "up"
+
 
 class Zombie:
+    __slots__ = ("x", "y", "health", "frame_index", "update_time", "frames", "animation_list",
+                 "image", "direction", "rect", "alerted")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
         self.health = 100
         self.frame_index = 0 
-        self.update_time = pygame.time.get_ticks()
-        self.animation_list = []
-        
-        # Load animation frames
-        for i in range(6):  
-            img_path = str(current_path) +'/assets/images/zombie/', f'{i+1}.png' 
-            img_path = ''.join(img_path)
-
-            image = pygame.image.load(img_path).convert_alpha()
-            # Scale the image
-            image = pygame.transform.scale(image, (ZOMBIE_SIZE, ZOMBIE_SIZE))
-            self.animation_list.append(image)
+        self.update_time = gametime.get_ticks()
+        self.frames = load_zombie_frames()
+        self.animation_list = self.frames["up"]
 
         # Current image to display
         self.image = self.animation_list[self.frame_index]
         self.direction = "down"  # Default direction
+        self.alerted = False  # Set once the zombie has seen the player or been shot, see vision.Vision
 
         # Add a rect attribute for collision and rendering
         self.rect = pygame.Rect(self.x, self.y, ZOMBIE_SIZE, ZOMBIE_SIZE)
 
-    def move_towards_player(self, player, walls):
-        dx = player.x - self.x
-        dy = player.y - self.y
-        distance = math.sqrt(dx**2 + dy**2)
-        
-        if distance > 0:
-            dx = dx / distance * ZOMBIE_SPEED
-            dy = dy / distance * ZOMBIE_SPEED
-            
-            # Try direct movement first
-            new_x = self.x + dx
-            new_y = self.y + dy
-            
-            # Check collision with walls
-            direct_path_blocked = False
-            for wall, wall_type in walls:  # Unpack the tuple into wall and wall_type
-                if (new_x + ZOMBIE_SIZE > wall.x and 
-                    new_x < wall.x + CELL_SIZE_SCALED and
-                    new_y + ZOMBIE_SIZE > wall.y and 
-                    new_y < wall.y + CELL_SIZE_SCALED):
-                    direct_path_blocked = True
-                    break
-            
-            # Here is the explanation of the code below first zombie try to move directly towards the player if there is no wall in between them
-            # if there is a wall in between them then zombie will try to move horizontally or vertically towards the player
-            # if both horizontal and vertical movements are blocked then zombie will not move
-            
-            if direct_path_blocked:
-                # Try horizontal movement only
-                new_x = self.x + dx
-                new_y = self.y
-                can_move_horizontal = True
-                
-                for wall,_ in walls:
-                    if (new_x + ZOMBIE_SIZE > wall.x and 
-                        new_x < wall.x + CELL_SIZE_SCALED and
-                        new_y + ZOMBIE_SIZE > wall.y and 
-                        new_y < wall.y + CELL_SIZE_SCALED):
-                        can_move_horizontal = False
-                        break
-                
-                # Try vertical movement only
-                if not can_move_horizontal:
-                    new_x = self.x
-                    new_y = self.y + dy
-                    can_move_vertical = True
-                    
-                    for wall,_ in walls:
-                        if (new_x + ZOMBIE_SIZE > wall.x and 
-                            new_x < wall.x + CELL_SIZE_SCALED and
-                            new_y + ZOMBIE_SIZE > wall.y and 
-                            new_y < wall.y + CELL_SIZE_SCALED):
-                            can_move_vertical = False
-                            break
-                    
-                    if can_move_vertical:
-                        # Move vertically
-                        self.x = new_x 
-                        self.y = new_y 
-                        # Update direction to face vertical movement
-                        if dy > 0:
-                            self.direction = "down"
-                        else:
-                            self.direction = "up"
-                    else:
-                        # If both horizontal and vertical movements are blocked, do nothing
-                        pass
-                else:
-                    # Move horizontally
-                    self.x = new_x
-                    self.y = new_y
-                    # Update direction to face horizontal movement
-                    if dx > 0:
-                        self.direction = "right"
-                    else:
-                        self.direction = "left"
-            else:
-                # Move directly towards the player
-                self.x = new_x
-                self.y = new_y
-                # Update direction based on movement
-                if abs(dx) > abs(dy):  # Horizontal movement
-                    if dx > 0:
-                        self.direction = "right"
-                    else:
-                        self.direction = "left"
-                else:  # Vertical movement
-                    if dy > 0:
-                        self.direction = "down"
-                    else:
-                        self.direction = "up"
+    def move_towards_player(self, player, walls, flow_field=None, push=None):
+        # push is this zombie's (x, y) separation from the others, see crowd.Crowd
+        step = chase_step(self.x, self.y, self.direction, player.x, player.y, walls, flow_field, push)
+        if step:
+            self.x, self.y, self.direction = step
 
             # Update the zombie's animation and direction
             self.update_direction()
@@ -135,31 +132,24 @@ class Zombie:
 
     def update_direction(self):
         """
-        Update the zombie's animation frame and rotate it based on direction.
+        Update the zombie's animation frame and pick the image facing its direction.
         """
         # Update animation
-        if pygame.time.get_ticks() - self.update_time > ANIMATION_COOLDOWN:
-            self.update_time = pygame.time.get_ticks()
+        if gametime.get_ticks() - self.update_time > ANIMATION_COOLDOWN:
+            self.update_time = gametime.get_ticks()
             self.frame_index += 1
             if self.frame_index >= len(self.animation_list):
                 self.frame_index = 0
 
-        # Rotate the current frame based on direction
-        if self.direction == "right":
-            self.image = pygame.transform.rotate(self.animation_list[self.frame_index], 270)
-        elif self.direction == "left":
-            self.image = pygame.transform.rotate(self.animation_list[self.frame_index], 90)
-        elif self.direction == "down":
-            self.image = pygame.transform.rotate(self.animation_list[self.frame_index], 180)
-        elif self.direction == "up":
-            self.image = self.animation_list[self.frame_index]  # No rotation for up
+        # Pick the pre-rotated frame for the current direction
+        self.image = self.frames[self.direction][self.frame_index]
 
     def draw(self, screen, camera=None):
         # Update the rect position to match the zombie's current position
         self.rect.topleft = (self.x, self.y)
         
         if camera:
-            screen.blit(self.image, camera.apply(self))  # Apply camera offset
+            camera.blit(screen, self.image, self)  # Apply camera offset, skipped when off screen
         else:
             screen.blit(self.image, (self.x, self.y))  # Default rendering
 